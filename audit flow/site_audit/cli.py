@@ -1,18 +1,27 @@
 # D:\tintashProject\site_audit\cli.py
-import argparse, os, sys, json
+import argparse, sys
 from pathlib import Path
 
 from site_audit.crawl import crawl_same_origin
-from site_audit.lighthouse_runner import run_lighthouse_json
-from site_audit.parse import rows_from_lhr
-from site_audit.severity import SeverityMapper
-from site_audit.write_out import write_csvs
+from site_audit.crawl_cache import CrawlCache
+from site_audit.cluster import cluster_urls, pick_samples
+from site_audit.simhash import near_duplicates, max_distance
+from site_audit.lighthouse_runner import (
+    run_lighthouse_many, run_lighthouse_repeated, default_workers, lighthouse_version,
+    report_path, CATEGORIES,
+)
+from site_audit.lh_cache import ResultCache, cache_key
+from site_audit.grade_pool import grade_reports
+from site_audit.model import PageRecord
+from site_audit.savings import SavingsIndex
+from site_audit.write_out import page_frames, write_csvs, write_savings_index
 try:
     from site_audit.write_out import write_xlsx
 except Exception:
     write_xlsx = None
 
-from site_audit.llm_enrich import enrich_rows_llm
+from site_audit.llm_enrich import enrich_rows_llm, make_session, make_limiters
+from site_audit.llm_cache import LLMCache, SCOPES, DEF_DB
 try:
     from site_audit.template_enrich import enrich_rows_template
 except Exception:
@@ -21,7 +30,41 @@ except Exception:
 SEV_RANK = {"low": 0, "medium": 1, "critical": 2}
 
 
-def main():
+def _prefix_weights(specs):
+    """["/docs/=2", "/blog/=-1"] -> {"/docs/": 2.0, "/blog/": -1.0}"""
+    out = {}
+    for spec in specs or []:
+        prefix, _, w = spec.rpartition("=")
+        if not prefix:
+            raise SystemExit(f"--prefix-weight expects PREFIX=WEIGHT, got {spec!r}")
+        out[prefix] = float(w)
+    return out
+
+
+def _project(all_pages, rep):
+    """
+    Copy each audited page's rows onto the pages that were not audited
+    because they share its template or are near-duplicates of it;
+    "Audited As" says where they came from.
+    """
+    for u, src in rep.items():
+        page = all_pages.get(src)
+        if page:
+            all_pages[u] = page.alias(u)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["render"]:
+        from site_audit.render import main as render_main
+        return render_main(argv[1:])
+    if argv[:1] == ["llm-cache"]:
+        from site_audit.llm_cache import main as llm_cache_main
+        return llm_cache_main(argv[1:])
+    if argv[:1] == ["regrade"]:
+        from site_audit.regrade import main as regrade_main
+        return regrade_main(argv[1:])
+
     ap = argparse.ArgumentParser("site-audit")
 
     ap.add_argument("--start", help="Start URL (same-origin crawl). If omitted, program will prompt.")
@@ -29,10 +72,94 @@ def main():
     ap.add_argument("--device", choices=["mobile","desktop"], default="mobile")
     ap.add_argument("--out", default="report")
     ap.add_argument("--timeout", type=int, default=25)
+    ap.add_argument("--crawl-concurrency", type=int, default=4,
+                    help="Max in-flight page fetches during the crawl (pooled keep-alive connections).")
+    ap.add_argument("--crawl-max-retries", type=int, default=4,
+                    help="Retries for pages answering 429/503 (honours Retry-After, else exponential "
+                         "backoff). In-flight fetches adapt between 1 and --crawl-concurrency.")
+    ap.add_argument("--link-parser", choices=["stream","bs4"], default="stream",
+                    help="stream = incremental <a href> scan of the response; "
+                         "bs4 = full BeautifulSoup parse (fallback).")
+    ap.add_argument("--crawl-max-bytes", type=int, default=2 * 1024 * 1024,
+                    help="Stop reading a page after this many bytes when scanning links (0 = no cap).")
+    ap.add_argument("--no-crawl-cache", action="store_true",
+                    help="Do not keep <out>/crawl_cache.json (ETag/Last-Modified revalidation between runs).")
+    ap.add_argument("--sitemap", action="store_true",
+                    help="Seed the crawl from robots.txt Sitemap: entries (or /sitemap.xml), "
+                         "including nested and gzipped sitemap indexes.")
+    ap.add_argument("--obey-robots", action="store_true",
+                    help="Skip URLs disallowed by robots.txt.")
+    ap.add_argument("--max-depth", type=int, default=None,
+                    help="Max link hops from --start (sitemap seeds count as 1).")
+    ap.add_argument("--prefix-weight", action="append", default=[], metavar="PREFIX=WEIGHT",
+                    help="Crawl URLs under PREFIX earlier (positive) or later (negative); "
+                         "one weight unit = one level of depth. Repeatable.")
+    ap.add_argument("--resume", action="store_true",
+                    help="Continue an interrupted crawl from <out>/frontier.json.")
+    ap.add_argument("--checkpoint-every", type=int, default=25,
+                    help="Checkpoint the crawl frontier every N pages (0 = only at the end).")
+    ap.add_argument("--seen-set", choices=["exact","hashed","bloom"], default="exact",
+                    help="How the crawler remembers discovered URLs: exact = set of strings; "
+                         "hashed = 64-bit fingerprints; bloom = scalable Bloom filter (tiny, may "
+                         "wrongly skip ~--bloom-fp-rate of URLs).")
+    ap.add_argument("--bloom-fp-rate", type=float, default=1e-6)
+    ap.add_argument("--frontier-mem-limit", type=int, default=0,
+                    help="Keep at most N queued URLs in memory and spill the rest to disk (0 = no limit).")
+    ap.add_argument("--samples-per-template", type=int, default=0,
+                    help="Cluster crawled URLs by path pattern and run Lighthouse on only "
+                         "this many per cluster; the rest reuse their findings (0 = audit all).")
+    ap.add_argument("--cluster-dom", action="store_true",
+                    help="Also split clusters by DOM-structure fingerprint.")
+    ap.add_argument("--near-dup-similarity", type=float, default=0,
+                    help="Treat pages whose SimHash content fingerprints are at least this similar "
+                         "(0-1, e.g. 0.95) as aliases of the first such page and skip Lighthouse "
+                         "for them (0 = off).")
     ap.add_argument("--verbose", action="store_true")
     ap.add_argument("--chrome-path", default=None)
     ap.add_argument("--also-html", action="store_true",
-                    help="Also save Lighthouse HTML (near JSON).")
+                    help="Also save Lighthouse HTML (near JSON) during the audit. Usually not needed: "
+                         "`site-audit render <out>` (or `render --serve`) builds it from the JSON "
+                         "on demand.")
+    ap.add_argument("--lh-workers", type=int, default=default_workers(),
+                    help="Lighthouse runs in parallel, each with its own Chrome "
+                         "(default: one per 4 CPU cores).")
+    ap.add_argument("--lh-timeout", type=float, default=180,
+                    help="Seconds before a Lighthouse run (and its Chrome) is killed (0 = no limit).")
+    ap.add_argument("--lh-retries", type=int, default=1,
+                    help="Retries per page after a failed or timed-out run (exponential backoff).")
+    ap.add_argument("--time-budget", type=float, default=0,
+                    help="Minutes the whole Lighthouse stage may take; pages that no longer fit "
+                         "are skipped and reported (0 = no budget).")
+    ap.add_argument("--runs", type=int, default=1,
+                    help="Lighthouse runs per page; the report fed to parsing/severity is the "
+                         "merge (median metrics, union of failing audits).")
+    ap.add_argument("--runs-tolerance", type=float, default=0.05,
+                    help="With --runs, stop adding runs for a page once LCP/CLS/TTI vary by "
+                         "less than this (stdev/mean).")
+    ap.add_argument("--raw-format", choices=["json", "gz", "zst"], default="json",
+                    help="How raw_json/ reports are stored: plain JSON, gzip, or zstd "
+                         "(needs the zstandard package). Everything that reads them accepts any.")
+    ap.add_argument("--slim-raw", action="store_true",
+                    help="Drop screenshots, filmstrip, treemap and debug data from stored reports "
+                         "(findings and the HTML report still work; ~5x smaller).")
+    ap.add_argument("--parse-workers", type=int, default=0,
+                    help="Processes for parsing + grading reports (default: one per CPU; "
+                         "small batches are done in-process).")
+    ap.add_argument("--savings-top-k", type=int, default=5,
+                    help="Worst offending items kept per rule for savings_index.csv "
+                         "(rules ranked by Lighthouse's estimated ms/bytes saved across pages).")
+    ap.add_argument("--lh-cache", action="store_true",
+                    help="Reuse stored Lighthouse reports for pages whose HTML (crawl content hash), "
+                         "device, Lighthouse version and flags are unchanged (<out>/lh_cache).")
+    ap.add_argument("--lh-cache-ttl", type=float, default=168,
+                    help="Hours before a cached report is re-audited anyway.")
+    ap.add_argument("--lh-cache-max-mb", type=int, default=2048,
+                    help="Evict least recently used cached reports beyond this size.")
+    ap.add_argument("--lh-persistent-chrome", action="store_true",
+                    help="Keep one headless Chrome per worker alive across pages "
+                         "(Lighthouse attaches via --port) instead of launching one per URL.")
+    ap.add_argument("--lh-recycle-every", type=int, default=20,
+                    help="Restart each persistent Chrome after this many pages (0 = never).")
 
     # filtering / enrichment strategy
     ap.add_argument("--only-failing", action="store_true",
@@ -50,7 +177,16 @@ def main():
     ap.add_argument("--llm-model", default=None)
     ap.add_argument("--llm-api-key", default=None)
     ap.add_argument("--llm-rate", type=float, default=0.4,
-                    help="Seconds between LLM calls.")
+                    help="Seconds between LLM calls (used as 1/rate requests/sec when --llm-rps is unset).")
+    ap.add_argument("--llm-concurrency", type=int, default=1,
+                    help="LLM requests in flight at once (match the inference server's parallel slots).")
+    ap.add_argument("--llm-rps", type=float, default=None,
+                    help="Token-bucket limit on LLM requests per second.")
+    ap.add_argument("--llm-tpm", type=float, default=None,
+                    help="Token-bucket limit on estimated LLM tokens per minute (prompt + answer).")
+    ap.add_argument("--llm-batch-size", type=int, default=1,
+                    help="Findings per LLM request (one JSON array answer); "
+                         "findings missing from a batch reply are retried one by one.")
     ap.add_argument("--llm-min-severity", choices=["low","medium","critical"], default="medium",
                     help="Only enrich rows at or above this severity.")
     ap.add_argument("--llm-top", type=int, default=50,
@@ -58,13 +194,22 @@ def main():
     ap.add_argument("--llm-mode", choices=["row","rule"], default="row",
                     help="row = call LLM per row; "
                          "rule = de-dup by Rule ID so we call at most once per rule.")
+    ap.add_argument("--llm-cache", default=DEF_DB,
+                    help="SQLite cache of LLM answers (`site-audit llm-cache compact` imports the old JSONL).")
+    ap.add_argument("--llm-cache-scope", choices=SCOPES, default="page",
+                    help="page = one answer per finding per page; content = reuse an answer on every "
+                         "page with the same rule + title + example + severity.")
+    ap.add_argument("--llm-cache-ttl", type=float, default=0,
+                    help="Days before a cached LLM answer is asked again (0 = never).")
+    ap.add_argument("--llm-cache-max", type=int, default=0,
+                    help="Keep at most this many cached answers, least recently used dropped first (0 = no cap).")
     ap.add_argument("--llm-max-calls", type=int, default=0,
                     help="Hard cap on number of LLM calls per page (0 = unlimited).")
 
     ap.add_argument("--xlsx", action="store_true",
                     help="Also write workbook.xlsx")
 
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     start = args.start or input("Start URL: ").strip()
 
@@ -76,25 +221,130 @@ def main():
 
     # 1. crawl
     log("[1/5] Crawling …")
-    urls = crawl_same_origin(start, args.max_pages, timeout=args.timeout, log=log)
-    (out_dir / "urls.txt").write_text("\n".join(urls), encoding="utf-8")
+    crawl_cache = CrawlCache(None if args.no_crawl_cache else out_dir / "crawl_cache.json")
+    urls = crawl_same_origin(start, args.max_pages, timeout=args.timeout, log=log,
+                             concurrency=args.crawl_concurrency,
+                             parser=args.link_parser, max_bytes=args.crawl_max_bytes,
+                             cache=crawl_cache,
+                             sitemaps=args.sitemap, obey_robots=args.obey_robots,
+                             max_depth=args.max_depth,
+                             prefix_weights=_prefix_weights(args.prefix_weight),
+                             state_path=out_dir / "frontier.json", resume=args.resume,
+                             checkpoint_every=args.checkpoint_every,
+                             seen_set=args.seen_set, bloom_fp_rate=args.bloom_fp_rate,
+                             frontier_mem_limit=args.frontier_mem_limit,
+                             max_retries=args.crawl_max_retries)
     print(f"Found {len(urls)} pages → {out_dir/'urls.txt'}")
+    log(f"  crawl cache: {crawl_cache.hits} unchanged (304), {crawl_cache.misses} downloaded")
+
+    # 1b. one representative per page type / per near-duplicate group
+    rep, key_of = {}, {}
+    if args.samples_per_template > 0:
+        dom = None
+        if args.cluster_dom:
+            dom = {u: (crawl_cache.get(u) or {}).get("dom") for u in urls}
+        clusters = cluster_urls(urls, dom=dom)
+        _, rep = pick_samples(clusters, args.samples_per_template)
+        key_of = {u: k for k, members in clusters.items() for u in members}
+        print(f"  {len(clusters)} templates → auditing {len(urls) - len(rep)} of {len(urls)} pages")
+
+    if args.near_dup_similarity > 0:
+        fps = {}
+        for u in urls:
+            h = (crawl_cache.get(u) or {}).get("simhash")
+            if h:
+                fps[u] = int(h, 16)
+        dups = near_duplicates([u for u in urls if u not in rep], fps,
+                               max_distance(args.near_dup_similarity))
+        rep.update(dups)
+        # a template sample may itself be an alias: point members at the final page
+        for u, src in rep.items():
+            while src in rep:
+                src = rep[src]
+            rep[u] = src
+        print(f"  {len(dups)} near-duplicate pages → reusing an earlier page's results")
+
+    if rep or key_of:
+        lines = [
+            f"{u}\t{key_of.get(u, '-')}\t" + (f"={rep[u]}" if u in rep else "audit")
+            for u in urls
+        ]
+    else:
+        lines = urls
+    (out_dir / "urls.txt").write_text("\n".join(lines), encoding="utf-8")
+    audit_urls = [u for u in urls if u not in rep]
 
     # 2. lighthouse
     log("[2/5] Lighthouse per page …")
     raw_json_dir = out_dir / "raw_json"
-    json_files = []
-    for i, u in enumerate(urls, 1):
-        print(f"  [{i}/{len(urls)}] LH: {u}")
-        jf = run_lighthouse_json(
-            u,
-            raw_json_dir,
-            device=args.device,
-            quiet=not args.verbose,
-            chrome_path=args.chrome_path,
-            also_html=args.also_html,
-        )
-        json_files.append(jf)
+    # 2a. reuse reports of pages that haven't changed
+    lh_cache, keys, todo = None, {}, list(audit_urls)
+    if args.lh_cache:
+        lh_cache = ResultCache(out_dir / "lh_cache", ttl_s=args.lh_cache_ttl * 3600,
+                               max_bytes=args.lh_cache_max_mb * 1024 * 1024)
+        flags = {"categories": CATEGORIES, "also_html": args.also_html, "runs": args.runs,
+                 "raw_format": args.raw_format, "slim": args.slim_raw}
+        version = lighthouse_version()
+        todo = []
+        for u in audit_urls:
+            h = (crawl_cache.get(u) or {}).get("hash")
+            if not h:  # never downloaded, so we can't tell if it changed
+                todo.append(u)
+                continue
+            keys[u] = cache_key(u, args.device, version, flags, h)
+            if not lh_cache.get(keys[u], report_path(u, raw_json_dir, fmt=args.raw_format)):
+                todo.append(u)
+
+    print(f"  {len(todo)} pages, {args.lh_workers} Lighthouse worker(s)")
+    lh_kw = {}
+    run_many = run_lighthouse_many
+    if args.runs > 1:
+        run_many = run_lighthouse_repeated
+        lh_kw = {"runs": args.runs, "tolerance": args.runs_tolerance}
+
+    def lh_progress(n, total, r):
+        if r.ok:
+            print(f"  [{n}/{total}] LH done: {r.url} ({r.duration:.0f}s)")
+        else:
+            print(f"  [{n}/{total}] LH {r.status}: {r.url}")
+
+    ran = run_many(
+        todo,
+        raw_json_dir,
+        **lh_kw,
+        workers=args.lh_workers,
+        log=log,
+        progress=lh_progress,
+        persistent_chrome=args.lh_persistent_chrome,
+        recycle_every=args.lh_recycle_every,
+        timeout=args.lh_timeout or None,
+        retries=args.lh_retries,
+        time_budget=args.time_budget * 60 or None,
+        device=args.device,
+        quiet=not args.verbose,
+        chrome_path=args.chrome_path,
+        also_html=args.also_html,
+        store_format=args.raw_format,
+        slim=args.slim_raw,
+    )
+    failed = [r for r in ran if not r.ok]
+    if failed:
+        print(f"  {len(failed)} page(s) without a report:")
+        for r in failed:
+            print(f"    {r.status:<8} {r.url}" + (f" (exit {r.exit_code})" if r.exit_code else ""))
+
+    if lh_cache is not None:
+        for r in ran:
+            if r.ok and r.url in keys:
+                lh_cache.put(keys[r.url], r.url, r.path)
+        lh_cache.save()
+
+    # only reports from this run (or lh-cache hits); skipped/failed pages have none
+    ran_ok = {r.url for r in ran if r.ok}
+    todo_set = set(todo)
+    graded_urls = [u for u in audit_urls if u in ran_ok or u not in todo_set]
+    json_files = [report_path(u, raw_json_dir, fmt=args.raw_format) for u in graded_urls]
+    crawled_url = {str(jf): u for u, jf in zip(graded_urls, json_files)}  # report path -> URL we asked for
 
     # 3. parse + severity
     log("[3/5] Parse + severity …")
@@ -102,32 +352,22 @@ def main():
     # project root (tintashProject)
     PKG_ROOT = Path(__file__).resolve().parents[1]
     RULES_PATH = PKG_ROOT / "config" / "rules.yaml"
-    mapper = SeverityMapper.from_yaml(str(RULES_PATH))
-
-    all_pages = {}
-
-    for jf in sorted(json_files):
-        p = Path(jf)
-        if not p.exists():
-            continue
-        try:
-            lhr = json.loads(p.read_text(encoding="utf-8"))
-        except Exception:
-            continue
-
-        rows = rows_from_lhr(lhr)
-
-        # assign severity for each row
-        for r in rows:
-            r["Severity"] = mapper.grade(r, lhr.get("audits", {}))
-
-        # filter to only medium/critical if requested
-        if args.only_failing:
-            rows = [
-                r for r in rows
-                if str(r.get("Severity", "low")) in ("medium", "critical")
-            ]
 
+    all_pages = {}  # page URL -> PageRecord
+    page_key = {}  # crawled URL -> all_pages key (LH finalUrl may differ)
+
+    # parse + grade in worker processes; pages come back in sorted-path order
+    savings = SavingsIndex(top_k=args.savings_top_k)
+    llm_session = llm_cache = llm_limiters = None  # shared by all pages
+    if args.llm:
+        llm_session = make_session(args.llm_concurrency)
+        llm_limiters = make_limiters(args.llm_rate, args.llm_rps, args.llm_tpm)
+        llm_cache = LLMCache(args.llm_cache, ttl_s=args.llm_cache_ttl * 86400,
+                             max_entries=args.llm_cache_max)
+    graded = grade_reports(sorted(json_files), RULES_PATH, workers=args.parse_workers,
+                           only_failing=args.only_failing, top_k=args.savings_top_k)
+    for jf, rows, page_savings in graded:
+        savings.add(crawled_url.get(str(jf), str(jf)), page_savings)
         if not rows:
             continue
 
@@ -169,7 +409,12 @@ def main():
                     base_url=args.llm_base_url,
                     model=args.llm_model,
                     api_key=args.llm_api_key,
-                    rate_limit_s=args.llm_rate,
+                    max_in_flight=args.llm_concurrency,
+                    session=llm_session,
+                    cache=llm_cache,
+                    key_scope=args.llm_cache_scope,
+                    batch_size=args.llm_batch_size,
+                    limiters=llm_limiters,
                 )
 
                 # Broadcast enriched answers to all matching rows
@@ -221,13 +466,29 @@ def main():
 
         # 5. collect rows for this page
         page_url = rows[0].get("Page URL", "UNKNOWN_PAGE")
-        all_pages.setdefault(page_url, []).extend(rows)
+        if page_url in all_pages:  # two crawled URLs landed on the same page
+            all_pages[page_url].findings.extend(PageRecord.from_rows(rows).findings)
+        else:
+            all_pages[page_url] = PageRecord.from_rows(rows, page_url)
+        page_key[crawled_url.get(str(jf), page_url)] = page_url
+
+    if llm_cache is not None:
+        log(f"  LLM cache: {llm_cache.hits} hit(s), {llm_cache.misses} miss(es)")
+        llm_cache.close()
+
+    # pages skipped by clustering / near-dup detection borrow their representative's findings
+    _project(all_pages, {u: page_key.get(src, src) for u, src in rep.items()})
 
     # Final write-out
     print(f"[5/5] Writing outputs → {out_dir}")
-    write_csvs(all_pages, out_dir)
+    frames = page_frames(all_pages)  # shared by the CSV and XLSX writers
+    write_csvs(all_pages, out_dir, frames)
+    savings_rows = savings.rows()
+    write_savings_index(savings_rows, out_dir)
     if args.xlsx and write_xlsx:
-        write_xlsx(all_pages, out_dir / "workbook.xlsx")
+        write_xlsx(all_pages, out_dir / "workbook.xlsx", savings_rows, frames)
+    if lh_cache is not None:
+        print(f"Lighthouse cache: {lh_cache.hits} hit(s), {lh_cache.misses} miss(es)")
     print("Done.")
 
 
@@ -0,0 +1,104 @@
+# D:\tintashProject\site_audit\cluster.py
+import hashlib, math, re, urllib.parse
+from collections import Counter
+
+_NUM  = re.compile(r"^\d+$")
+_UUID = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.I)
+_HEX  = re.compile(r"^(?=.*\d)[0-9a-f]{12,}$", re.I)
+# slug carrying an id, e.g. "blue-shoe-12345" or "sku_9a81"
+_SLUG_ID = re.compile(r"^(?=.*[a-z])(?=.*\d)[a-z0-9]+(?:[-_][a-z0-9]+)+$", re.I)
+
+
+def _segment(seg: str) -> str:
+    if _NUM.match(seg):
+        return "{id}"
+    if _UUID.match(seg):
+        return "{uuid}"
+    if _HEX.match(seg):
+        return "{hash}"
+    if _SLUG_ID.match(seg) and re.search(r"\d{3,}", seg):
+        return "{slug}"
+    return seg
+
+
+def url_template(url: str) -> str:
+    """
+    Path pattern of a URL: id-like segments become placeholders and the
+    query keeps only its (sorted) key names.
+      https://x.com/product/123?color=red&size=9 -> https://x.com/product/{id}?color&size
+    """
+    p = urllib.parse.urlsplit(url)
+    segs = [_segment(s) for s in p.path.split("/")]
+    keys = sorted({k for k, _ in urllib.parse.parse_qsl(p.query, keep_blank_values=True)})
+    q = "&".join(keys)
+    return urllib.parse.urlunsplit((p.scheme, p.netloc.lower(), "/".join(segs) or "/", q, ""))
+
+
+def _collapse_wide(templates, min_variants):
+    """
+    Second pass for slugs the regexes can't spot (/product/blue-shoe,
+    /product/red-hat, ...): if one path position takes min_variants or more
+    distinct values while the rest of the path is the same, it is a variable.
+    """
+    if not min_variants:
+        return templates
+    split = [t.split("/") for t in templates]
+    out = list(split)
+    width = max((len(s) for s in split), default=0)
+    for i in range(3, width):  # 0,1,2 are "scheme:", "", host
+        groups = {}
+        for parts in out:
+            if len(parts) > i and not parts[i].startswith("{"):
+                key = (len(parts), tuple(parts[:i]), tuple(parts[i + 1:]))
+                groups.setdefault(key, set()).add(parts[i])
+        wide = {k for k, vals in groups.items() if len(vals) >= min_variants}
+        if not wide:
+            continue
+        out = [
+            parts[:i] + ["{slug}"] + parts[i + 1:]
+            if len(parts) > i and (len(parts), tuple(parts[:i]), tuple(parts[i + 1:])) in wide
+            else parts
+            for parts in out
+        ]
+    return ["/".join(p) for p in out]
+
+
+def dom_signature(tag_counts) -> str:
+    """
+    Coarse structural fingerprint from tag counts: which tags appear and
+    roughly how often (log2 buckets), so two product pages with a different
+    number of reviews still match.
+    """
+    sig = ",".join(
+        f"{t}:{int(math.log2(c + 1))}" for t, c in sorted(Counter(tag_counts).items())
+    )
+    return hashlib.sha1(sig.encode("utf-8")).hexdigest()[:12]
+
+
+def cluster_urls(urls, dom=None, min_variants=5):
+    """
+    Group urls by template (plus DOM signature when `dom` maps url -> sig).
+    Returns {cluster key: [urls...]} with both keys and members in input order.
+    """
+    templates = _collapse_wide([url_template(u) for u in urls], min_variants)
+    clusters = {}
+    for u, t in zip(urls, templates):
+        key = t
+        if dom is not None and dom.get(u):
+            key = f"{t} #{dom[u]}"
+        clusters.setdefault(key, []).append(u)
+    return clusters
+
+
+def pick_samples(clusters, n=1):
+    """
+    First n members of each cluster get audited. Returns (samples, rep) where
+    rep maps every other member to the sample whose results it borrows.
+    """
+    samples, rep = [], {}
+    for members in clusters.values():
+        head = members[: max(1, n)]
+        samples.extend(head)
+        for u in members[len(head):]:
+            rep[u] = head[0]
+    return samples, rep
@@ -1,8 +1,19 @@
 # D:\tintashProject\site_audit\crawl.py
-import urllib.parse, requests
-from collections import deque
+import urllib.parse, requests, codecs, hashlib, re, heapq, time
+from collections import deque, Counter
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 
+from site_audit.cluster import dom_signature
+from site_audit.frontier import Frontier
+from site_audit.seenset import make_seen
+from site_audit.politeness import AdaptiveThrottle, THROTTLE_STATUS, parse_retry_after
+from site_audit.simhash import simhash
+from site_audit.sitemap import ROBOTS_AGENT, load_robots, sitemap_seeds
+
 def _norm(u: str) -> str:
     """Normalize URL: keep scheme/host/path/query, drop fragment; ensure path present."""
     try:
@@ -29,12 +40,90 @@ def _should_enqueue(href: str) -> bool:
     bad_prefixes = ("javascript:", "mailto:", "tel:", "data:", "#")
     return not any(href.lower().startswith(p) for p in bad_prefixes)
 
-def crawl_same_origin(start, max_pages=25, timeout=25, log=lambda *a, **k: None):
-    start = _norm(start)
-    origin = start
-    seen, q, out = set([start]), deque([start]), []
+_WORD = re.compile(r"\w+")
+
+
+class _HrefParser(HTMLParser):
+    """
+    Collects <a href> values as they stream past; never builds a tree.
+    Optionally counts start tags (tags) and markup/visible-text tokens
+    (tokens, for the SimHash fingerprint) into the given Counters.
+    """
+
+    def __init__(self, tags=None, tokens=None):
+        super().__init__(convert_charrefs=True)
+        self.found = []
+        self.tags = tags
+        self.tokens = tokens
+        self._hidden = 0  # inside <script>/<style>
+
+    def handle_starttag(self, tag, attrs):
+        if self.tags is not None:
+            self.tags[tag] += 1
+        if self.tokens is not None:
+            self.tokens["<" + tag] += 1
+            if tag in ("script", "style"):
+                self._hidden += 1
+        if tag != "a":
+            return
+        for k, v in attrs:
+            if k == "href" and v is not None:
+                self.found.append(v)
+                break
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in ("script", "style") and self.tokens is not None:
+            self._hidden -= 1
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style") and self._hidden:
+            self._hidden -= 1
+
+    def handle_data(self, data):
+        if self.tokens is not None and not self._hidden:
+            self.tokens.update(w.lower() for w in _WORD.findall(data))
+
+def iter_hrefs(r, max_bytes=2 * 1024 * 1024, chunk_size=16 * 1024, digest=None,
+               tags=None, tokens=None):
+    """
+    Yield <a href> values from a streamed response, chunk by chunk, and stop
+    reading after max_bytes of body (0 = no cap). If digest (a hashlib object)
+    is given it is fed every byte that was read; Counters passed as tags /
+    tokens collect start-tag counts / content tokens.
+    """
+    dec = codecs.getincrementaldecoder(r.encoding or "utf-8")(errors="replace")
+    parser = _HrefParser(tags, tokens)
+    got = 0
+    try:
+        for chunk in r.iter_content(chunk_size=chunk_size):
+            if not chunk:
+                continue
+            if max_bytes and got + len(chunk) > max_bytes:
+                chunk = chunk[: max_bytes - got]
+            got += len(chunk)
+            if digest is not None:
+                digest.update(chunk)
+
+            parser.feed(dec.decode(chunk))
+            if parser.found:
+                yield from parser.found
+                parser.found = []
+
+            if max_bytes and got >= max_bytes:
+                break
+        parser.feed(dec.decode(b"", final=True))
+        parser.close()
+        yield from parser.found
+    finally:
+        r.close()
 
+def _session(concurrency=1):
     sess = requests.Session()
+    # one keep-alive pool per host, sized so every in-flight fetch gets a socket
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, concurrency))
+    sess.mount("http://", adapter)
+    sess.mount("https://", adapter)
     # Pretend to be Chrome so we don't get weird placeholder content
     sess.headers.update({
         "User-Agent": (
@@ -45,44 +134,255 @@ def crawl_same_origin(start, max_pages=25, timeout=25, log=lambda *a, **k: None)
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
         "Accept-Language": "en-US,en;q=0.9",
     })
+    return sess
 
-    while q and len(out) < max_pages:
-        u = q.popleft()
+class _Fetched:
+    """What a worker hands back: hrefs (None = unusable page), timing, throttling."""
+    __slots__ = ("hrefs", "elapsed", "throttled", "retry_after", "error")
 
-        # fetch page
-        try:
-            r = sess.get(u, timeout=timeout, allow_redirects=True)
-            if r.status_code >= 400:
-                log(f"skip {u} [{r.status_code}]")
-                continue
+    def __init__(self, hrefs=None, elapsed=0.0, throttled=False, retry_after=None, error=False):
+        self.hrefs = hrefs
+        self.elapsed = elapsed
+        self.throttled = throttled
+        self.retry_after = retry_after
+        self.error = error
 
-            ctype = r.headers.get("Content-Type", "").lower()
-            if "text/html" not in ctype:
-                log(f"skip non-HTML {u} [{ctype}]")
-                continue
+def _fetch(sess, u, timeout, log, parser="stream", max_bytes=0, cache=None):
+    """Fetch one page in a worker thread."""
+    t0 = time.monotonic()
+    hrefs = _fetch_hrefs(sess, u, timeout, log, parser, max_bytes, cache)
+    if isinstance(hrefs, _Fetched):
+        hrefs.elapsed = time.monotonic() - t0
+        return hrefs
+    return _Fetched(hrefs, time.monotonic() - t0)
+
+def _fetch_hrefs(sess, u, timeout, log, parser, max_bytes, cache):
+    """Raw hrefs of u, None if unusable, or a _Fetched marking throttling/errors."""
+    try:
+        headers = cache.validators(u) if cache is not None else {}
+        r = sess.get(u, timeout=timeout, allow_redirects=True, stream=True, headers=headers)
+
+        # unchanged since last crawl: reuse stored outlinks, skip the body
+        if r.status_code == 304 and cache is not None and cache.get(u):
+            r.close()
+            log(f"304 {u}")
+            return list(cache.hit(u).get("links") or [])
+
+        # rate limited: the caller backs off and re-enqueues
+        if r.status_code in THROTTLE_STATUS:
+            r.close()
+            return _Fetched(throttled=True,
+                            retry_after=parse_retry_after(r.headers.get("Retry-After")))
 
+        if r.status_code >= 400:
+            log(f"skip {u} [{r.status_code}]")
+            r.close()
+            return None
+
+        ctype = r.headers.get("Content-Type", "").lower()
+        if "text/html" not in ctype:
+            log(f"skip non-HTML {u} [{ctype}]")
+            r.close()
+            return None
+
+        digest, tags, tokens = hashlib.sha1(), Counter(), Counter()
+        if parser == "stream":
+            hrefs = list(iter_hrefs(r, max_bytes=max_bytes, digest=digest,
+                                    tags=tags, tokens=tokens))
+        else:
+            # fallback: full download + DOM parse
+            digest.update(r.content)
             soup = BeautifulSoup(r.text, "html.parser")
-        except Exception as e:
-            log(f"error {u}: {e}")
+            hrefs = [a["href"] for a in soup.find_all("a", href=True)]
+            tags.update(t.name for t in soup.find_all(True))
+            tokens.update("<" + t for t in tags.elements())
+            for el in soup(["script", "style"]):
+                el.decompose()
+            tokens.update(w.lower() for w in _WORD.findall(soup.get_text(" ")))
+
+        if cache is not None:
+            cache.put(u, {
+                "status": r.status_code,
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "hash": digest.hexdigest(),
+                "dom": dom_signature(tags),
+                "simhash": format(simhash(tokens), "016x"),
+                "links": hrefs,
+            })
+        return hrefs
+    except Exception as e:
+        log(f"error {u}: {e}")
+        return _Fetched(error=True)
+
+def _links(u, hrefs, origin):
+    for href in hrefs:
+        if not _should_enqueue(href):
+            continue
+
+        nu = urllib.parse.urljoin(u, href)
+        if not _is_http(nu):
             continue
 
-        # if we reach here, it's a valid HTML page we actually saw
-        out.append(u)
+        nu = _norm(nu)
+        if _same_origin(nu, origin):
+            yield nu
+
+def _pending(inflight, retry):
+    return [e for e, _ in inflight] + [e for _, _, e in retry]
+
+def crawl_same_origin(start, max_pages=25, timeout=25, log=lambda *a, **k: None,
+                      concurrency=1, parser="stream", max_bytes=2 * 1024 * 1024,
+                      cache=None, sitemaps=False, obey_robots=False,
+                      max_depth=None, prefix_weights=None,
+                      state_path=None, resume=False, checkpoint_every=25,
+                      seen_set="exact", bloom_fp_rate=1e-6, frontier_mem_limit=0,
+                      max_retries=4):
+    """
+    Crawl start's origin with up to `concurrency` fetches in flight, in
+    Frontier priority order (plain BFS unless prefix_weights / sitemap
+    priorities say otherwise). Fetches run ahead of the queue but results are
+    consumed in the order they were popped, so with depth-only scoring the
+    result is identical to a one-at-a-time crawl; with weights it is
+    near-priority order (a page already in flight is not overtaken).
+
+    `concurrency` is a ceiling: an AdaptiveThrottle moves the actual number
+    in flight up and down (AIMD) with the origin's latency and 429/503s.
+    Throttled URLs are retried up to max_retries times after Retry-After or
+    exponential backoff, which can move them later in the order.
+
+    parser="stream" pulls links out of the body as it downloads and stops at
+    max_bytes; parser="bs4" is the old full-download BeautifulSoup path.
+
+    cache (a CrawlCache) turns fetches into conditional GETs and reuses the
+    stored outlinks of pages that answer 304; it is saved when the crawl ends.
+
+    sitemaps=True seeds the queue (right after start) from the sitemaps listed
+    in robots.txt, or /sitemap.xml. obey_robots=True drops URLs that
+    robots.txt disallows; the start URL itself is always fetched.
+
+    max_depth limits link hops from start (sitemap seeds count as depth 1).
+    state_path: the frontier is checkpointed there every checkpoint_every
+    pages and when the crawl stops; resume=True picks up from it.
+
+    For very large URL spaces: seen_set="hashed" keeps 64-bit fingerprints
+    instead of strings, seen_set="bloom" a scalable Bloom filter with total
+    false-positive rate bloom_fp_rate; frontier_mem_limit > 0 spills the
+    queue beyond that many entries to SQLite (<state_path>.queue.db).
+    """
+    start = _norm(start)
+    origin = start
+    concurrency = max(1, int(concurrency or 1))
+
+    sess = _session(concurrency)
+
+    robots = None
+    if sitemaps or obey_robots:
+        robots, listed = load_robots(sess, origin, timeout, log)
+
+    def allowed(nu):
+        if robots is not None and obey_robots and not robots.can_fetch(ROBOTS_AGENT, nu):
+            log(f"robots.txt disallows {nu}")
+            return False
+        return True
+
+    if resume and state_path and Path(state_path).exists():
+        frontier = Frontier.load(state_path, max_depth=max_depth, prefix_weights=prefix_weights,
+                                 mem_limit=frontier_mem_limit)
+        log(f"resuming: {len(frontier.done)} pages done, {len(frontier)} queued")
+    else:
+        spill = None
+        if frontier_mem_limit and state_path:
+            spill = Path(str(state_path) + ".queue.db")
+            spill.unlink(missing_ok=True)  # stale queue from an older crawl
+        frontier = Frontier(max_depth=max_depth, prefix_weights=prefix_weights,
+                            seen=make_seen(seen_set, bloom_fp_rate),
+                            mem_limit=frontier_mem_limit, spill_path=spill)
+        frontier.discover(start)
+        frontier.push(start, 0)
+
+        if sitemaps:
+            # a few spares past max_pages in case some seeds turn out to be dead
+            n0 = len(frontier)
+            for loc, prio in sitemap_seeds(sess, origin, listed, limit=max_pages * 2,
+                                           timeout=timeout, log=log):
+                nu = _norm(loc)
+                if (_is_http(nu) and _same_origin(nu, origin)
+                        and frontier.discover(nu) and allowed(nu)):
+                    frontier.push(nu, 1, prio)
+            log(f"sitemap seeded {len(frontier) - n0} urls")
 
-        # discover links
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            if not _should_enqueue(href):
+    done = frontier.done
+    throttle = AdaptiveThrottle(max_concurrency=concurrency)
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    inflight = deque()  # (frontier entry, future) in pop order
+    retry = []          # heap of (ready at, seq, frontier entry) for throttled URLs
+    attempts = {}
+    processed = 0
+
+    try:
+        while (len(frontier) or inflight or retry) and len(done) < max_pages:
+            now = time.monotonic()
+            while retry and retry[0][0] <= now:
+                frontier.requeue(heapq.heappop(retry)[2])
+
+            # keep the pipe full (up to the throttle's current window), but
+            # never fetch more than we could still keep
+            while (len(frontier) and len(inflight) < throttle.limit()
+                   and len(done) + len(inflight) < max_pages
+                   and not throttle.wait()):
+                entry = frontier.pop()
+                inflight.append((entry, pool.submit(
+                    _fetch, sess, entry[2], timeout, log, parser, max_bytes, cache)))
+
+            if not inflight:
+                # paused by Retry-After, or only throttled URLs left: wait for the earliest
+                waits = [w for w in (throttle.wait(), retry[0][0] - now if retry else 0) if w > 0]
+                time.sleep(max(0.05, min(waits, default=0.05)))
                 continue
 
-            nu = urllib.parse.urljoin(u, href)
-            if not _is_http(nu):
+            entry, fut = inflight.popleft()
+            _, _, u, depth = entry
+            res = fut.result()
+            processed += 1
+
+            if res.throttled:
+                throttle.on_throttle(res.retry_after)
+                n = attempts[u] = attempts.get(u, 0) + 1
+                if n > max_retries:
+                    log(f"skip {u} [throttled {n} times]")
+                else:
+                    delay = throttle.backoff(n, res.retry_after)
+                    log(f"throttled {u}: retry {n}/{max_retries} in {delay:.1f}s "
+                        f"(window {throttle.limit()})")
+                    heapq.heappush(retry, (time.monotonic() + delay, processed, entry))
                 continue
+            if res.error:
+                throttle.on_error()
+            else:
+                throttle.on_success(res.elapsed)
+
+            if res.hrefs is not None:
+                # if we reach here, it's a valid HTML page we actually saw
+                done.append(u)
 
-            nu = _norm(nu)
+                # discover links
+                for nu in _links(u, res.hrefs, origin):
+                    if frontier.discover(nu) and allowed(nu):
+                        frontier.push(nu, depth + 1)
 
-            if _same_origin(nu, origin) and nu not in seen:
-                seen.add(nu)
-                q.append(nu)
+            if state_path and checkpoint_every and processed % checkpoint_every == 0:
+                frontier.save(state_path, pending=_pending(inflight, retry))
+                if cache is not None:
+                    cache.save()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        sess.close()
+        if state_path:
+            # anything still in flight or waiting to retry was never processed
+            frontier.save(state_path, pending=_pending(inflight, retry))
+        frontier.close()
+        if cache is not None:
+            cache.save()
 
-    return out
+    return done[:max_pages]
@@ -0,0 +1,98 @@
+# D:\tintashProject\site_audit\crawl_cache.py
+import json, os, threading, time
+from pathlib import Path
+
+
+class CrawlCache:
+    """
+    Per-URL crawl memory: HTTP validators (ETag / Last-Modified), status,
+    content hash and the hrefs we pulled out last time. Lets the crawler send
+    conditional GETs and reuse outlinks on 304 Not Modified.
+
+    path=None keeps everything in memory (nothing is written).
+    On disk it is a journal, one {"u": url, "e": entry} line per download;
+    save() appends only what changed since the last save and rewrites the
+    file compacted once stale lines outnumber live entries.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.entries = {}
+        self.hits = 0      # 304s served from cache
+        self.misses = 0    # full downloads
+        self._lock = threading.Lock()
+        self._dirty = set()  # urls put since the last save
+        self._lines = 0      # journal lines on disk
+        self._compact = True  # next save rewrites the file (new, or old one-object format)
+        if self.path and self.path.exists():
+            try:
+                self._read()
+            except Exception:
+                self.entries = {}
+
+    def _read(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    obj = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of an interrupted save
+                if set(obj) == {"u", "e"}:
+                    self.entries[obj["u"]] = obj["e"]
+                    self._lines += 1
+                    self._compact = False
+                else:
+                    self.entries.update(obj)  # the old whole-file JSON object
+                    self._compact = True
+
+    def get(self, url):
+        with self._lock:
+            return self.entries.get(url)
+
+    def put(self, url, entry):
+        """Store a fresh download (counts as a miss)."""
+        entry = dict(entry, fetched_at=time.time())
+        with self._lock:
+            self.entries[url] = entry
+            self._dirty.add(url)
+            self.misses += 1
+
+    def hit(self, url):
+        """Record a 304 for url and return its stored entry."""
+        with self._lock:
+            self.hits += 1
+            return self.entries.get(url) or {}
+
+    def validators(self, url):
+        """Conditional request headers for url (empty if we know nothing)."""
+        e = self.get(url) or {}
+        h = {}
+        if e.get("etag"):
+            h["If-None-Match"] = e["etag"]
+        if e.get("last_modified"):
+            h["If-Modified-Since"] = e["last_modified"]
+        return h
+
+    @staticmethod
+    def _line(url, entry):
+        return json.dumps({"u": url, "e": entry}, ensure_ascii=False) + "\n"
+
+    def save(self):
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            compact = self._compact or self._lines > 2 * len(self.entries) + 1000
+            urls = list(self.entries) if compact else list(self._dirty)
+            data = "".join(self._line(u, self.entries[u]) for u in urls)
+            self._dirty.clear()
+        if compact:
+            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, self.path)
+            self._lines = len(urls)
+            self._compact = False
+        elif data:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+            self._lines += len(urls)
@@ -0,0 +1,199 @@
+# D:\tintashProject\site_audit\frontier.py
+import heapq, json, os, sqlite3, tempfile, urllib.parse
+from pathlib import Path
+
+from site_audit.seenset import save_seen, load_seen
+
+
+class Frontier:
+    """
+    Crawl frontier: a priority queue of URLs still to fetch, the set of URLs
+    already discovered, and the pages accepted so far (`done`).
+
+    Lower score pops first: score = depth - prefix weight - sitemap priority,
+    ties broken by discovery order. With no weights that is exactly BFS.
+    Queue entries are (score, seq, url, depth) tuples.
+
+    `seen` can be any set-like with add / in (see seenset.make_seen). A
+    plain set is checkpointed as an append-only log (<path>.seen.log): each
+    save writes only the URLs discovered since the last one.
+    With mem_limit > 0 at most that many entries stay in memory; the
+    lowest-priority half is spilled to a SQLite file (spill_path) and read
+    back in batches as the in-memory heap drains.
+    """
+
+    def __init__(self, max_depth=None, prefix_weights=None, seen=None,
+                 mem_limit=0, spill_path=None):
+        self.max_depth = max_depth
+        # longest matching prefix wins
+        self.prefix_weights = sorted((prefix_weights or {}).items(), key=lambda kv: -len(kv[0]))
+        self.seen = seen if seen is not None else set()
+        self.done = []
+        self._heap = []
+        self._seq = 0
+        self._seen_new = []         # discovered since the last save (plain set only)
+        self._seen_log_bytes = None  # length of our .seen.log; None = not written yet
+
+        self.mem_limit = max(0, int(mem_limit or 0))
+        self._db = None
+        self._disk_n = 0
+        self._disk_head = None  # cached smallest spilled entry
+        self._tmp_spill = False
+        if self.mem_limit:
+            if spill_path is None:
+                self._tmp_spill = True
+                fd, spill_path = tempfile.mkstemp(suffix=".queue.db")
+                os.close(fd)
+            self.spill_path = Path(spill_path)
+            self._db = sqlite3.connect(str(self.spill_path))
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS queue ("
+                " seq INTEGER PRIMARY KEY, score REAL, url TEXT, depth INTEGER)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS queue_order ON queue (score, seq)")
+            self._disk_n = self._db.execute("SELECT COUNT(*) FROM queue").fetchone()[0]
+
+    def __len__(self):
+        return len(self._heap) + self._disk_n
+
+    def score(self, url, depth, priority=None):
+        path = urllib.parse.urlsplit(url).path or "/"
+        w = next((w for p, w in self.prefix_weights if path.startswith(p)), 0.0)
+        return depth - w - (priority or 0.0)
+
+    def discover(self, url) -> bool:
+        """Mark url as seen. True if it was new."""
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        if isinstance(self.seen, set):
+            self._seen_new.append(url)
+        return True
+
+    def push(self, url, depth=0, priority=None) -> bool:
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        heapq.heappush(self._heap, (self.score(url, depth, priority), self._seq, url, depth))
+        self._seq += 1
+        if self.mem_limit and len(self._heap) > self.mem_limit:
+            self._spill()
+        return True
+
+    def pop(self):
+        if self._disk_n:
+            head = self._head()
+            if not self._heap or head < self._heap[0]:
+                self._refill()
+        return heapq.heappop(self._heap)
+
+    def requeue(self, entry):
+        """Put a popped entry back with its original score and position."""
+        heapq.heappush(self._heap, tuple(entry))
+
+    # spill to disk
+    def _spill(self):
+        self._heap.sort()  # a sorted list is a valid heap
+        keep = max(1, self.mem_limit // 2)
+        moved = self._heap[keep:]
+        del self._heap[keep:]
+        self._db.executemany(
+            "INSERT INTO queue (score, seq, url, depth) VALUES (?, ?, ?, ?)", moved
+        )
+        self._disk_n += len(moved)
+        self._disk_head = None
+
+    def _head(self):
+        if self._disk_head is None:
+            row = self._db.execute(
+                "SELECT score, seq, url, depth FROM queue ORDER BY score, seq LIMIT 1"
+            ).fetchone()
+            self._disk_head = tuple(row)
+        return self._disk_head
+
+    def _refill(self):
+        rows = self._db.execute(
+            "SELECT score, seq, url, depth FROM queue ORDER BY score, seq LIMIT ?",
+            (max(1, self.mem_limit // 2),),
+        ).fetchall()
+        self._db.executemany("DELETE FROM queue WHERE seq = ?", [(r[1],) for r in rows])
+        self._disk_n -= len(rows)
+        self._disk_head = None
+        for r in rows:
+            heapq.heappush(self._heap, tuple(r))
+
+    # checkpointing
+    def save(self, path, pending=()):
+        """
+        Write the frontier to path (atomically). `pending` are popped entries
+        that were in flight and never processed; they go back in the queue.
+        Spilled entries stay in the SQLite file, compact seen-sets are written
+        next to path as <path>.seen.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            "version": 1,
+            "seq": self._seq,
+            "done": self.done,
+            "queue": [list(e) for e in self._heap] + [list(e) for e in pending],
+        }
+        if isinstance(self.seen, set):
+            state["seen_log"] = self._append_seen(Path(str(path) + ".seen.log"))
+        else:
+            state["seen_meta"] = save_seen(self.seen, str(path) + ".seen")
+        if self._db is not None:
+            self._db.commit()
+            state["spill"] = str(self.spill_path)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _append_seen(self, log):
+        """Add the newly seen URLs to log; returns its length (bytes) as of this save."""
+        if self._seen_log_bytes is None:
+            new, mode = self.seen, "wb"  # first save of this frontier: start the log over
+        else:
+            new, mode = self._seen_new, "ab"
+        with open(log, mode) as fh:
+            fh.write("".join(u + "\n" for u in new).encode("utf-8"))
+            self._seen_log_bytes = fh.tell()
+        self._seen_new = []
+        return self._seen_log_bytes
+
+    @staticmethod
+    def _read_seen_log(log, n):
+        # lines past n were appended after the last complete checkpoint: drop them
+        with open(log, "r+b") as fh:
+            data = fh.read(n)
+            fh.truncate(n)
+        return set(data.decode("utf-8").splitlines())
+
+    @classmethod
+    def load(cls, path, max_depth=None, prefix_weights=None, mem_limit=0):
+        state = json.loads(Path(path).read_text(encoding="utf-8"))
+        if "seen_meta" in state:
+            seen = load_seen(str(path) + ".seen", state["seen_meta"])
+        elif "seen_log" in state:
+            seen = cls._read_seen_log(str(path) + ".seen.log", state["seen_log"])
+        else:
+            seen = set(state.get("seen") or [])
+        spill = state.get("spill")
+        if spill and not mem_limit:
+            mem_limit = 100_000  # the spilled part has to be read back somehow
+        f = cls(max_depth=max_depth, prefix_weights=prefix_weights, seen=seen,
+                mem_limit=mem_limit, spill_path=spill if mem_limit else None)
+        f._seq = state.get("seq", 0)
+        if "seen_log" in state:
+            f._seen_log_bytes = state["seen_log"]
+        f.done = list(state.get("done") or [])
+        f._heap = [tuple(e) for e in state.get("queue") or []]
+        heapq.heapify(f._heap)
+        return f
+
+    def close(self):
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+            if self._tmp_spill:
+                self.spill_path.unlink(missing_ok=True)
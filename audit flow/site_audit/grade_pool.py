@@ -0,0 +1,97 @@
+# D:\tintashProject\site_audit\grade_pool.py
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from site_audit.lhr_store import load_lhr
+from site_audit.parse import rows_from_lhr, savings_from_lhr
+from site_audit.severity import SeverityMapper
+
+# below this many reports, starting worker processes costs more than it saves
+MIN_POOL_FILES = 16
+
+_mapper = None  # per worker process, loaded once by _init
+
+
+def _init(rules_path):
+    global _mapper
+    _mapper = SeverityMapper.from_yaml(str(rules_path))
+
+
+def grade_report(path, only_failing=False, mapper=None, top_k=5):
+    """
+    Parse one stored report and grade its rows; returns (rows, savings_from_lhr).
+    ([], {}) if missing or unreadable.
+    """
+    mapper = mapper or _mapper
+    p = Path(path)
+    if not p.exists():
+        return [], {}
+    try:
+        lhr = load_lhr(p)
+    except Exception:
+        return [], {}
+
+    rows = rows_from_lhr(lhr)
+    for r, sev in zip(rows, mapper.grade_many(rows, lhr.get("audits", {}))):
+        r["Severity"] = sev
+
+    # filter to only medium/critical if requested
+    if only_failing:
+        rows = [r for r in rows if str(r.get("Severity", "low")) in ("medium", "critical")]
+    return rows, savings_from_lhr(lhr, top_k)
+
+
+def parse_report(path, top_k=5):
+    """
+    Ungraded parse of one stored report: (rows, values, savings), where
+    values = {rule id: [numericValue, score]} for the rows' audits (what
+    SeverityMapper.grade_frame needs). None if missing or unreadable.
+    """
+    p = Path(path)
+    if not p.exists():
+        return None
+    try:
+        lhr = load_lhr(p)
+    except Exception:
+        return None
+    rows = rows_from_lhr(lhr)
+    audits = lhr.get("audits", {})
+    values = {r["Rule ID"]: [audits[r["Rule ID"]].get("numericValue"),
+                             audits[r["Rule ID"]].get("score")] for r in rows}
+    return rows, values, savings_from_lhr(lhr, top_k)
+
+
+def _fan_out(fn, paths, workers=None, initializer=None, initargs=()):
+    """Yield (path, fn(path)) in path order, over a process pool when it pays."""
+    paths = list(paths)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths) or 1))
+    if workers == 1 or len(paths) < MIN_POOL_FILES:
+        if initializer:
+            initializer(*initargs)
+        for p in paths:
+            yield p, fn(p)
+        return
+
+    chunk = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                             initargs=initargs) as pool:
+        yield from zip(paths, pool.map(fn, paths, chunksize=chunk))
+
+
+def grade_reports(paths, rules_path, workers=None, only_failing=False, top_k=5):
+    """
+    Yield (path, graded rows, savings) for every report, in the order given.
+    Reports are parsed and graded in a pool of `workers` processes (default:
+    one per CPU), each loading the severity rules once; results stream back
+    as soon as the next one in order is ready.
+    """
+    one = partial(grade_report, only_failing=only_failing, top_k=top_k)
+    for p, (rows, savings) in _fan_out(one, paths, workers, _init, (str(rules_path),)):
+        yield p, rows, savings
+
+
+def parse_reports(paths, workers=None, top_k=5):
+    """Yield (path, parse_report(path)) in the order given, like grade_reports."""
+    yield from _fan_out(partial(parse_report, top_k=top_k), paths, workers)
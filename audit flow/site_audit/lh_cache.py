@@ -0,0 +1,104 @@
+# D:\tintashProject\site_audit\lh_cache.py
+import hashlib, json, os, shutil, time
+from pathlib import Path
+
+from site_audit.lhr_store import html_path
+
+
+def cache_key(url, device, lh_version, flags, content_hash) -> str:
+    """Everything that can change a Lighthouse report for this page."""
+    sig = json.dumps([url, device, lh_version, flags, content_hash], sort_keys=True)
+    return hashlib.sha1(sig.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Stored Lighthouse reports keyed by cache_key, under root/:
+      index.json            key -> {file, url, created, used, size}
+      <key>.report.json[.gz|.zst]  (and <key>.report.html when one was written)
+    Entries expire ttl_s after they were created; past max_bytes the least
+    recently used entries are dropped first.
+    """
+
+    def __init__(self, root, ttl_s=7 * 24 * 3600, max_bytes=2 * 1024 ** 3):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._index_path = self.root / "index.json"
+        try:
+            self.index = json.loads(self._index_path.read_text(encoding="utf-8"))
+        except Exception:
+            self.index = {}
+
+    def _report(self, key):
+        e = self.index.get(key) or {}
+        return self.root / e.get("file", f"{key}.report.json")
+
+    def _files(self, key):
+        return [self._report(key), self.root / f"{key}.report.html"]
+
+    def _drop(self, key):
+        for f in self._files(key):
+            f.unlink(missing_ok=True)
+        self.index.pop(key, None)
+
+    def get(self, key, dest_json):
+        """
+        On a hit, place the stored report at dest_json (plus .html sibling if
+        stored) and return True.
+        """
+        e = self.index.get(key)
+        src = self._report(key)
+        if not e or not src.exists() or (self.ttl_s and time.time() - e["created"] > self.ttl_s):
+            if e:
+                self._drop(key)
+            self.misses += 1
+            return False
+
+        dest_json = Path(dest_json)
+        dest_json.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(src, dest_json)
+        html = self.root / f"{key}.report.html"
+        if html.exists():
+            shutil.copyfile(html, html_path(dest_json))
+        e["used"] = time.time()
+        self.hits += 1
+        return True
+
+    def put(self, key, url, report_json):
+        report_json = Path(report_json)
+        if not report_json.exists():
+            return
+        if key in self.index:
+            self._drop(key)
+        name = key + report_json.name[report_json.name.index(".report.json"):]
+        size = 0
+        for src, dst in zip((report_json, html_path(report_json)),
+                            (self.root / name, self.root / f"{key}.report.html")):
+            if src.exists():
+                shutil.copyfile(src, dst)
+                size += dst.stat().st_size
+        now = time.time()
+        self.index[key] = {"file": name, "url": url, "created": now, "used": now, "size": size}
+
+    def evict(self):
+        now = time.time()
+        if self.ttl_s:
+            for k in [k for k, e in self.index.items() if now - e["created"] > self.ttl_s]:
+                self._drop(k)
+        total = sum(e.get("size", 0) for e in self.index.values())
+        if self.max_bytes and total > self.max_bytes:
+            for k, e in sorted(self.index.items(), key=lambda kv: kv[1]["used"]):
+                if total <= self.max_bytes:
+                    break
+                total -= e.get("size", 0)
+                self._drop(k)
+
+    def save(self):
+        self.evict()
+        tmp = self._index_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(self.index), encoding="utf-8")
+        os.replace(tmp, self._index_path)
@@ -0,0 +1,92 @@
+# D:\tintashProject\site_audit\lhr_merge.py
+import copy, statistics
+
+# audits whose numbers we take the median of; everything else is pass/fail
+METRIC_AUDITS = (
+    "largest-contentful-paint",
+    "cumulative-layout-shift",
+    "interactive",
+    "first-contentful-paint",
+    "speed-index",
+    "total-blocking-time",
+    "max-potential-fid",
+)
+# what has to settle before we stop adding runs (the metrics parse.py reports)
+STABILITY_METRICS = ("largest-contentful-paint", "cumulative-layout-shift", "interactive")
+
+
+def _num(lhr, aid):
+    return ((lhr.get("audits") or {}).get(aid) or {}).get("numericValue")
+
+
+def spread(lhrs, aid):
+    """Coefficient of variation (stdev / mean) of an audit's numericValue across runs."""
+    vals = [v for v in (_num(l, aid) for l in lhrs) if v is not None]
+    if len(vals) < 2:
+        return None
+    mean = statistics.fmean(vals)
+    if mean == 0:
+        return 0.0
+    return statistics.stdev(vals) / abs(mean)
+
+
+def is_stable(lhrs, tolerance=0.05, metrics=STABILITY_METRICS):
+    """True once every metric's run-to-run variation is within tolerance."""
+    if len(lhrs) < 2:
+        return False
+    for aid in metrics:
+        cv = spread(lhrs, aid)
+        if cv is not None and cv > tolerance:
+            return False
+    return True
+
+
+def merge_lhrs(lhrs):
+    """
+    Fold several runs of the same page into one LHR:
+      - the run with the median LCP is the base (keeps details consistent),
+      - METRIC_AUDITS get the median numericValue and score of all runs,
+      - any other audit that failed in some run is taken from its worst run
+        (union of failing audits),
+      - category scores are medians.
+    """
+    lhrs = [l for l in lhrs if l and l.get("audits")]
+    if not lhrs:
+        raise ValueError("no usable Lighthouse runs to merge")
+    if len(lhrs) == 1:
+        return lhrs[0]
+
+    by_lcp = sorted(lhrs, key=lambda l: _num(l, "largest-contentful-paint") or 0)
+    merged = copy.deepcopy(by_lcp[(len(by_lcp) - 1) // 2])
+    audits = merged["audits"]
+
+    for aid in {a for l in lhrs for a in (l.get("audits") or {})}:
+        runs = [l["audits"][aid] for l in lhrs if aid in l["audits"]]
+        if aid in METRIC_AUDITS:
+            target = audits.setdefault(aid, copy.deepcopy(runs[0]))
+            vals = [a.get("numericValue") for a in runs if a.get("numericValue") is not None]
+            scores = [a.get("score") for a in runs if a.get("score") is not None]
+            if vals:
+                target["numericValue"] = statistics.median(vals)
+            if scores:
+                target["score"] = statistics.median(scores)
+            continue
+
+        scored = [a for a in runs if a.get("score") is not None]
+        if not scored:
+            continue
+        worst = min(scored, key=lambda a: a["score"])
+        cur = (audits.get(aid) or {}).get("score")
+        if worst["score"] < 1 and (cur is None or worst["score"] < cur):
+            audits[aid] = copy.deepcopy(worst)
+
+    for cid, cat in (merged.get("categories") or {}).items():
+        scores = [
+            ((l.get("categories") or {}).get(cid) or {}).get("score") for l in lhrs
+        ]
+        scores = [s for s in scores if s is not None]
+        if scores:
+            cat["score"] = statistics.median(scores)
+
+    merged["siteAuditRuns"] = len(lhrs)
+    return merged
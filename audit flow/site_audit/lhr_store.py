@@ -0,0 +1,118 @@
+# D:\tintashProject\site_audit\lhr_store.py
+import gzip, json, os
+from pathlib import Path
+
+try:
+    import zstandard
+except Exception:
+    zstandard = None
+
+SUFFIXES = {"json": ".report.json", "gz": ".report.json.gz", "zst": ".report.json.zst"}
+
+# details payloads nothing downstream reads (pixels, treemap, debug blobs)
+_HEAVY_DETAILS = ("filmstrip", "screenshot", "treemap-data", "debugdata")
+# hidden audits whose tables are only for LH's own debugging views
+_HEAVY_AUDITS = ("network-requests", "main-thread-tasks", "network-rtt", "network-server-latency")
+
+
+def slim_lhr(lhr: dict) -> dict:
+    """
+    Drop what neither parse/severity nor the HTML report renderer needs:
+    screenshots/filmstrip/treemap data, the full-page screenshot, i18n
+    message paths and detailed timing. Audits keep their place (the report
+    renderer looks every auditRef up), only their heavy details go.
+    Works in place and returns lhr.
+    """
+    lhr.pop("fullPageScreenshot", None)
+    if isinstance(lhr.get("timing"), dict):
+        lhr["timing"] = {"total": lhr["timing"].get("total")}
+    if isinstance(lhr.get("i18n"), dict):
+        lhr["i18n"].pop("icuMessagePaths", None)
+
+    for aid, a in (lhr.get("audits") or {}).items():
+        d = a.get("details")
+        if not isinstance(d, dict):
+            continue
+        if d.get("type") in _HEAVY_DETAILS or aid in _HEAVY_AUDITS:
+            a.pop("details", None)
+    return lhr
+
+
+def _zstd_required():
+    if zstandard is None:
+        raise RuntimeError("zstandard is not installed: `pip install zstandard` "
+                           "or use --raw-format gz")
+
+
+def save_lhr(lhr: dict, path, fmt="json"):
+    path = Path(path)
+    data = json.dumps(lhr, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    tmp = path.with_name(path.name + ".tmp")
+    if fmt == "gz":
+        data = gzip.compress(data, compresslevel=6)
+    elif fmt == "zst":
+        _zstd_required()
+        data = zstandard.ZstdCompressor(level=10).compress(data)
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return path
+
+
+def read_lhr_bytes(path) -> bytes:
+    """Raw JSON bytes of a stored report, whatever format it was saved in."""
+    raw = Path(path).read_bytes()
+    if raw[:2] == b"\x1f\x8b":
+        return gzip.decompress(raw)
+    if raw[:4] == b"\x28\xb5\x2f\xfd":
+        _zstd_required()
+        return zstandard.ZstdDecompressor().decompressobj().decompress(raw)
+    return raw
+
+
+def load_lhr(path) -> dict:
+    """Load a report saved as plain, gzipped or zstd JSON (sniffed, not by name)."""
+    return json.loads(read_lhr_bytes(path).decode("utf-8"))
+
+
+def stored_path(json_path, fmt="json") -> Path:
+    """<slug>.report.json -> <slug>.report.json[.gz|.zst]"""
+    p = str(json_path)
+    if p.endswith(".report.json"):
+        p = p[: -len(".report.json")]
+    return Path(p + SUFFIXES[fmt])
+
+
+def html_path(report) -> Path:
+    """The .report.html that sits next to a stored report of any format."""
+    p = str(report)
+    for suf in sorted(SUFFIXES.values(), key=len, reverse=True):
+        if p.endswith(suf):
+            return Path(p[: -len(suf)] + ".report.html")
+    return Path(p + ".html")
+
+
+def find_reports(folder):
+    """Every stored report in folder, any format, sorted by name."""
+    folder = Path(folder)
+    out = []
+    for suf in SUFFIXES.values():
+        out.extend(folder.glob("*" + suf))
+    return sorted(out)
+
+
+def store_report(json_path, fmt="json", slim=False) -> Path:
+    """
+    Re-save a fresh Lighthouse .report.json as fmt (optionally slimmed),
+    removing the original. Returns the stored path.
+    """
+    json_path = Path(json_path)
+    if fmt == "json" and not slim:
+        return json_path
+    dest = stored_path(json_path, fmt)
+    lhr = load_lhr(json_path)
+    if slim:
+        slim_lhr(lhr)
+    save_lhr(lhr, dest, fmt)
+    if dest != json_path:
+        json_path.unlink(missing_ok=True)
+    return dest
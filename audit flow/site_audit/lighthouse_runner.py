@@ -1,6 +1,15 @@
 # D:\tintashProject\site_audit\lighthouse_runner.py
-import subprocess, shutil, re, os
+import subprocess, shutil, re, os, socket, tempfile, queue, time, functools, signal, sys, threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
+
+from site_audit.lhr_merge import merge_lhrs, is_stable
+from site_audit.lhr_store import SUFFIXES, store_report, load_lhr, save_lhr, slim_lhr, html_path
+
+CATEGORIES = "performance,accessibility,seo,best-practices"
 
 def _slug(url: str) -> str:
     s = re.sub(r"^https?://", "", url)
@@ -20,6 +29,7 @@ def _find(exe_names):
             return cand
     return None
 
+@functools.lru_cache(maxsize=None)
 def _find_lighthouse():
     # allow explicit override
     env = os.getenv("LIGHTHOUSE_PATH")
@@ -28,38 +38,107 @@ def _find_lighthouse():
     # Windows often has .CMD wrappers
     return _find(["lighthouse", "lighthouse.cmd", "lighthouse.exe"])
 
+@functools.lru_cache(maxsize=None)
 def _find_npx():
     env = os.getenv("NPX_PATH")
     if env and os.path.exists(env):
         return env
     return _find(["npx", "npx.cmd", "npx.exe"])
 
-def run_lighthouse_json(url: str, out_dir: Path, device="mobile",
-                        quiet=True, chrome_path=None, also_html=False) -> Path:
-    out_dir = Path(out_dir); out_dir.mkdir(parents=True, exist_ok=True)
-    base = out_dir / _slug(url)  # LH will append .report.json / .report.html
-
+def _lighthouse_cmd():
     lh = _find_lighthouse()
     if lh:
-        cmd = [lh, url]
-    else:
-        npx = _find_npx()
-        if not npx:
-            raise RuntimeError(
-                "lighthouse CLI not found. Install with `npm i -g lighthouse`, "
-                "ensure %USERPROFILE%\\AppData\\Roaming\\npm is on PATH, "
-                "or set LIGHTHOUSE_PATH to lighthouse(.cmd)."
-            )
-        cmd = [npx, "lighthouse", url]
+        return [lh]
+    npx = _find_npx()
+    if not npx:
+        raise RuntimeError(
+            "lighthouse CLI not found. Install with `npm i -g lighthouse`, "
+            "ensure %USERPROFILE%\\AppData\\Roaming\\npm is on PATH, "
+            "or set LIGHTHOUSE_PATH to lighthouse(.cmd)."
+        )
+    # --yes: never stop at npx's "Need to install..." prompt
+    return [npx, "--yes", "lighthouse"]
+
+@functools.lru_cache(maxsize=None)
+def lighthouse_version() -> str:
+    try:
+        r = subprocess.run(_lighthouse_cmd() + ["--version"], capture_output=True,
+                           text=True, timeout=120)
+        return r.stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+def _find_chrome(chrome_path=None):
+    if chrome_path and os.path.exists(chrome_path):
+        return chrome_path
+    env = os.getenv("CHROME_PATH")
+    if env and os.path.exists(env):
+        return env
+    for name in ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser",
+                 "chrome", "msedge"):
+        p = shutil.which(name)
+        if p:
+            return p
+    # common Windows / macOS install dirs
+    for cand in (
+        os.path.join(os.environ.get("PROGRAMFILES", ""), "Google", "Chrome", "Application", "chrome.exe"),
+        os.path.join(os.environ.get("PROGRAMFILES(X86)", ""), "Google", "Chrome", "Application", "chrome.exe"),
+        os.path.join(os.environ.get("LOCALAPPDATA", ""), "Google", "Chrome", "Application", "chrome.exe"),
+        "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+    ):
+        if os.path.exists(cand):
+            return cand
+    return None
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def default_workers() -> int:
+    # each Lighthouse run drives a full Chrome; more than ~1 per 4 cores
+    # starts to skew the performance numbers themselves
+    return max(1, (os.cpu_count() or 2) // 4)
+
+def report_path(url: str, out_dir: Path, tag=None, fmt="json") -> Path:
+    """
+    Where the JSON report for url ends up (tag = repeat run number,
+    fmt = json | gz | zst storage, see lhr_store).
+    """
+    return Path(out_dir) / (_slug(url) + (f".run{tag}" if tag else "") + SUFFIXES[fmt])
+
+@dataclass
+class LighthouseResult:
+    """Outcome of auditing one URL."""
+    url: str
+    path: Path                    # expected report path (exists only if status == "ok")
+    status: str = "ok"            # ok | failed | timeout | skipped
+    duration: float = 0.0         # seconds, all attempts
+    exit_code: Optional[int] = None
+    stderr_tail: str = ""
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+def _lighthouse_argv(url, base, device="mobile", quiet=True, chrome_path=None,
+                     also_html=False, user_data_dir=None, port=None):
+    cmd = _lighthouse_cmd() + [url]
 
     outputs = ["--output=json"]
     if also_html:
         outputs += ["--output=html"]
 
+    chrome_flags = "--headless=new"
+    if user_data_dir:
+        # LH splits --chrome-flags yargs-style, so quote paths with spaces
+        chrome_flags += f' --user-data-dir="{user_data_dir}"'
+
     flags = [
-        "--only-categories=performance,accessibility,seo,best-practices",
+        f"--only-categories={CATEGORIES}",
         *outputs,
-        "--chrome-flags=--headless=new",
+        f"--chrome-flags={chrome_flags}",
         "--enable-error-reporting=false",
         "--output-path", str(base),
     ]
@@ -70,14 +149,384 @@ def run_lighthouse_json(url: str, out_dir: Path, device="mobile",
 
     if chrome_path:
         flags += ["--chrome-path", chrome_path]
+    if port:
+        flags += [f"--port={port}"]
     if quiet:
         flags.append("--quiet")
+    return cmd + flags
+
+def _descendants(pid) -> list:
+    """Pids of every process below pid (POSIX: /proc, else `ps`); [] if unknown."""
+    children = {}
+    try:
+        if os.path.isdir("/proc"):
+            for d in os.listdir("/proc"):
+                if not d.isdigit():
+                    continue
+                try:
+                    with open(f"/proc/{d}/stat", "rb") as f:
+                        stat = f.read()
+                except OSError:
+                    continue
+                # "pid (comm) state ppid ..." -- comm may hold spaces and parens
+                ppid = int(stat.rsplit(b")", 1)[1].split()[1])
+                children.setdefault(ppid, []).append(int(d))
+        else:
+            out = subprocess.run(["ps", "-A", "-o", "pid=,ppid="], capture_output=True,
+                                 text=True, timeout=10).stdout
+            for line in out.splitlines():
+                p, pp = map(int, line.split())
+                children.setdefault(pp, []).append(p)
+    except Exception:
+        return []
+    out, todo = [], [pid]
+    while todo:
+        for c in children.get(todo.pop(), []):
+            out.append(c)
+            todo.append(c)
+    return out
 
-    subprocess.run(
-        cmd + flags,
-        check=False,
+def _kill_tree(proc):
+    """Kill Lighthouse and everything it spawned (Chrome and its helpers)."""
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            # chrome-launcher starts Chrome detached (its own session), out of
+            # reach of our killpg; find it through the process tree first
+            below = _descendants(proc.pid)
+            os.killpg(proc.pid, signal.SIGKILL)  # own session, see _run_once
+            groups = set()
+            for pid in below:
+                try:
+                    groups.add(os.getpgid(pid))
+                    os.kill(pid, signal.SIGKILL)
+                except OSError:
+                    pass
+            for pg in groups - {proc.pid, os.getpgrp()}:
+                try:
+                    os.killpg(pg, signal.SIGKILL)
+                except OSError:
+                    pass
+    except (ProcessLookupError, OSError):
+        pass
+    try:
+        proc.kill()
+    except OSError:
+        pass
+
+def _run_once(url, out_dir, timeout=None, quiet=True, tag=None, **kw) -> LighthouseResult:
+    out_dir = Path(out_dir); out_dir.mkdir(parents=True, exist_ok=True)
+    base = out_dir / (_slug(url) + (f".run{tag}" if tag else ""))  # LH will append .report.json / .report.html
+    # IMPORTANT: Lighthouse writes "<base>.report.json", not by replacing extension.
+    jf = Path(str(base) + ".report.json")
+    jf.unlink(missing_ok=True)  # a stale report must not pass for this run's
+
+    t0 = time.monotonic()
+    proc = subprocess.Popen(
+        _lighthouse_argv(url, base, quiet=quiet, **kw),
         stdout=(subprocess.DEVNULL if quiet else None),
-        stderr=(subprocess.DEVNULL if quiet else None),
+        stderr=subprocess.PIPE,
+        # own process group, so a timeout can take down Chrome too
+        start_new_session=(os.name != "nt"),
+        creationflags=(subprocess.CREATE_NEW_PROCESS_GROUP if os.name == "nt" else 0),
     )
-    # IMPORTANT: Lighthouse writes "<base>.report.json", not by replacing extension.
-    return Path(str(base) + ".report.json")
+    status = "ok"
+    try:
+        _, err = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_tree(proc)
+        _, err = proc.communicate()
+        status = "timeout"
+
+    err = (err or b"").decode("utf-8", "replace")
+    if not quiet and err:
+        sys.stderr.write(err)
+    if status == "ok" and (proc.returncode != 0 or not jf.exists() or jf.stat().st_size == 0):
+        status = "failed"
+    return LighthouseResult(url, jf, status, time.monotonic() - t0, proc.returncode,
+                            err[-2000:], 1)
+
+def run_lighthouse(url: str, out_dir: Path, timeout=None, retries=0, backoff_s=5.0,
+                   deadline=None, on_retry=None, **kw) -> LighthouseResult:
+    """
+    Audit url with a wall-clock timeout per attempt (the whole process tree
+    is killed when it runs out) and up to `retries` retries with exponential
+    backoff. `deadline` (time.monotonic() value) caps every attempt and stops
+    retrying once the remaining time can't fit another one. on_retry() may
+    return kwargs to change for the next attempt (e.g. a new Chrome port).
+    """
+    total, res = 0.0, None
+    for attempt in range(1, retries + 2):
+        t = timeout
+        if deadline is not None:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            t = min(t, left) if t else left
+        res = _run_once(url, out_dir, timeout=t, **kw)
+        total += res.duration
+        res.duration, res.attempts = total, attempt
+        if res.ok or attempt > retries:
+            break
+
+        delay = backoff_s * (2 ** (attempt - 1))
+        if deadline is not None and deadline - time.monotonic() < delay + res.duration:
+            break
+        time.sleep(delay)
+        if on_retry:
+            kw.update(on_retry() or {})
+
+    if res is None:
+        res = LighthouseResult(url, report_path(url, out_dir, kw.get("tag")), "skipped")
+    return res
+
+def run_lighthouse_json(url: str, out_dir: Path, device="mobile",
+                        quiet=True, chrome_path=None, also_html=False,
+                        user_data_dir=None, port=None, timeout=None) -> Path:
+    return run_lighthouse(url, out_dir, timeout=timeout, device=device, quiet=quiet,
+                          chrome_path=chrome_path, also_html=also_html,
+                          user_data_dir=user_data_dir, port=port).path
+
+
+class ChromeSession:
+    """
+    One headless Chrome kept alive across Lighthouse runs. Lighthouse is
+    pointed at it with --port (chrome-launcher attaches to a Chrome already
+    listening there instead of spawning one, and leaves it running).
+    """
+
+    def __init__(self, user_data_dir, chrome_path=None, log=lambda *a, **k: None):
+        self.user_data_dir = user_data_dir
+        self.chrome_path = chrome_path
+        self.log = log
+        self.proc = None
+        self.port = None
+
+    def start(self, timeout=30):
+        exe = _find_chrome(self.chrome_path)
+        if not exe:
+            raise RuntimeError("Chrome not found for --lh-persistent-chrome; "
+                               "pass --chrome-path or set CHROME_PATH.")
+        self.port = _free_port()
+        self.proc = subprocess.Popen(
+            [exe, "--headless=new", f"--remote-debugging-port={self.port}",
+             f"--user-data-dir={self.user_data_dir}", "--no-first-run",
+             "--no-default-browser-check", "--disable-extensions", "about:blank"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                break
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/json/version", timeout=2):
+                    self.log(f"  chrome up on :{self.port}")
+                    return self.port
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("headless Chrome did not open its debugging port")
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def stop(self):
+        if self.proc is not None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self.proc = None
+        self.port = None
+
+
+class _Slot:
+    """A worker's private Chrome profile (and Chrome, in persistent mode)."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.chrome = None
+        self.pages = 0
+
+
+def run_lighthouse_many(urls, out_dir: Path, workers=1, log=lambda *a, **k: None,
+                        persistent_chrome=False, recycle_every=20,
+                        timeout=None, retries=0, backoff_s=5.0, time_budget=None,
+                        tags=None, store_format="json", slim=False, progress=None, **kw) -> list:
+    """
+    Run Lighthouse on every url with up to `workers` processes at once.
+    Each worker slot owns a Chrome profile dir, and every run gets a fresh
+    debugging port, so concurrent Chromes never share state. A failing or
+    hung page (timeout = seconds per attempt, then the process tree is
+    killed; `retries` more attempts) only ever costs its own slot.
+    Returns a LighthouseResult per url, in url order.
+
+    persistent_chrome=True starts one Chrome per worker and reuses it, instead
+    of Lighthouse launching a browser per page; it is restarted every
+    recycle_every pages (and after a failed run) to contain leaks.
+
+    time_budget (seconds) bounds the whole batch: no attempt runs past it, and
+    a page is skipped once the time left is less than a typical page takes.
+
+    tags (parallel to urls) mark repeat runs of the same url; each writes
+    its own <slug>.run<tag>.report.json.
+
+    store_format / slim re-save each finished report compressed and/or
+    slimmed (lhr_store.store_report) inside the worker, so the write cost is
+    spread over the pool and the full-size JSON never piles up on disk.
+
+    progress(n, total, result) is called as each page finishes (n counts up).
+    """
+    urls = list(urls)
+    tags = list(tags) if tags is not None else [None] * len(urls)
+    if not urls:
+        return []
+    _lighthouse_cmd()  # fail once, up front, if Lighthouse isn't installed
+    workers = max(1, min(int(workers or 1), len(urls) or 1))
+    deadline = time.monotonic() + time_budget if time_budget else None
+    typical = [None]  # EWMA seconds per successful page
+    lock = threading.Lock()
+
+    slots = queue.Queue()
+    all_slots = []
+    tmp_root = tempfile.mkdtemp(prefix="site-audit-chrome-")
+    for i in range(workers):
+        slot = _Slot(os.path.join(tmp_root, f"worker{i}"))
+        all_slots.append(slot)
+        slots.put(slot)
+
+    def one(u, tag):
+        slot = slots.get()
+        try:
+            # a stale report from a past run must not pass for this one, even if skipped
+            report_path(u, out_dir, tag, store_format).unlink(missing_ok=True)
+            if deadline is not None:
+                left = deadline - time.monotonic()
+                if left <= 0 or (typical[0] and left < typical[0]):
+                    return LighthouseResult(u, report_path(u, out_dir, tag, store_format), "skipped")
+
+            run_kw = dict(kw, timeout=timeout, retries=retries, backoff_s=backoff_s,
+                          deadline=deadline, tag=tag)
+            if not persistent_chrome:
+                res = run_lighthouse(u, out_dir, user_data_dir=slot.profile,
+                                     port=_free_port(),
+                                     on_retry=lambda: {"port": _free_port()}, **run_kw)
+            else:
+                if slot.chrome is None:
+                    slot.chrome = ChromeSession(slot.profile, kw.get("chrome_path"), log)
+                if not slot.chrome.alive():
+                    slot.chrome.start()
+                    slot.pages = 0
+
+                def fresh_chrome():
+                    slot.chrome.stop()
+                    slot.pages = 0
+                    return {"port": slot.chrome.start()}
+
+                res = run_lighthouse(u, out_dir, port=slot.chrome.port,
+                                     on_retry=fresh_chrome, **run_kw)
+                slot.pages += 1
+                if not res.ok or (recycle_every and slot.pages >= recycle_every):
+                    slot.chrome.stop()
+
+            if res.ok:
+                res.path = store_report(res.path, store_format, slim)
+                with lock:
+                    per_page = res.duration / max(1, res.attempts)
+                    typical[0] = per_page if typical[0] is None else 0.7 * typical[0] + 0.3 * per_page
+            return res
+        finally:
+            slots.put(slot)
+
+    out = [None] * len(urls)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futs = {pool.submit(one, u, t): i for i, (u, t) in enumerate(zip(urls, tags))}
+            for n, fut in enumerate(as_completed(futs), 1):
+                i = futs[fut]
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    res = LighthouseResult(urls[i], report_path(urls[i], out_dir, tags[i], store_format),
+                                           "failed", stderr_tail=str(e))
+                out[i] = res
+                if progress:
+                    progress(n, len(urls), res)
+                if not res.ok and res.stderr_tail.strip():
+                    log("    " + res.stderr_tail.strip().splitlines()[-1])
+    finally:
+        for slot in all_slots:
+            if slot.chrome is not None:
+                slot.chrome.stop()
+        shutil.rmtree(tmp_root, ignore_errors=True)
+    return out
+
+
+def run_lighthouse_repeated(urls, out_dir: Path, runs=3, tolerance=0.05,
+                            log=lambda *a, **k: None, store_format="json", slim=False,
+                            **kw) -> list:
+    """
+    Audit every url up to `runs` times and merge each page's runs into one
+    LHR at the usual report path (median metrics, union of failing audits).
+    The first round does min(3, runs) runs of every page at once through the
+    worker pool; after that, only pages whose LCP/CLS/TTI still vary by more
+    than `tolerance` (coefficient of variation) get another run per round.
+    time_budget (seconds) covers all rounds together.
+    store_format / slim apply to the merged report only; the per-run files
+    are read back and deleted.
+    Returns one LighthouseResult per url, in url order.
+    """
+    urls = list(urls)
+    done = {u: [] for u in urls}      # url -> LHRs of successful runs
+    spent = {u: 0.0 for u in urls}
+    tried = {u: 0 for u in urls}
+    run_files = []
+    for u in urls:  # last run's merged report must not stand in for a page that fails now
+        report_path(u, out_dir, fmt=store_format).unlink(missing_ok=True)
+    # one deadline for all rounds; each round only gets the time that is left
+    time_budget = kw.pop("time_budget", None)
+    deadline = time.monotonic() + time_budget if time_budget else None
+
+    want = {u: min(3, runs) for u in urls}
+    while want:
+        if deadline is not None:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            kw["time_budget"] = left
+        batch = [(u, tried[u] + k + 1) for u, n in want.items() for k in range(n)]
+        res = run_lighthouse_many([u for u, _ in batch], out_dir, log=log,
+                                  tags=[t for _, t in batch], **kw)
+        for r in res:
+            tried[r.url] += 1
+            spent[r.url] += r.duration
+            run_files.append(r.path)
+            if r.ok:
+                try:
+                    done[r.url].append(load_lhr(r.path))
+                except Exception as e:
+                    log(f"  unreadable run {r.path}: {e}")
+        want = {
+            u: 1 for u in urls
+            if tried[u] < runs and not is_stable(done[u], tolerance)
+            and not any(r.url == u and r.status == "skipped" for r in res)
+        }
+
+    out = []
+    for u in urls:
+        jf = report_path(u, out_dir, fmt=store_format)
+        if not done[u]:
+            out.append(LighthouseResult(u, jf, "failed", spent[u], attempts=tried[u]))
+            continue
+        merged = merge_lhrs(done[u])
+        save_lhr(slim_lhr(merged) if slim else merged, jf, store_format)
+        log(f"  {u}: merged {len(done[u])} run(s)")
+        out.append(LighthouseResult(u, jf, "ok", spent[u], 0, "", tried[u]))
+
+    for p in run_files:
+        Path(p).unlink(missing_ok=True)
+        html_path(p).unlink(missing_ok=True)
+    return out
@@ -0,0 +1,193 @@
+# D:\tintashProject\site_audit\llm_cache.py
+import argparse, hashlib, json, os, sqlite3, sys, threading, time
+from pathlib import Path
+
+DEF_DB = os.getenv("LLM_CACHE_DB", "report/llm_cache.sqlite")
+DEF_JSONL = os.getenv("LLM_CACHE", "report/llm_cache.jsonl")  # legacy append-only file
+
+SCOPES = ("page", "content")
+# row fields that identify a finding, per key scope
+_SCOPE_FIELDS = {
+    "page": ("Page URL", "Rule ID", "Title", "Example", "Severity"),
+    "content": ("Rule ID", "Title", "Example", "Severity"),
+}
+
+
+def legacy_key(row) -> str:
+    """The key the JSONL cache used (page-scoped, no model / prompt version)."""
+    sig = "|".join(str(row.get(k, "")) for k in _SCOPE_FIELDS["page"])
+    return hashlib.sha1(sig.encode("utf-8")).hexdigest()
+
+
+def answer_key(row, scope="page", model="", prompt_version=1) -> str:
+    """
+    page    = one answer per finding per page (the old behaviour)
+    content = one answer per rule + title + example + severity, shared by
+              every page where the same finding shows up
+    Model and prompt version are part of the key, so changing either asks again.
+    """
+    sig = "|".join([scope, str(model), str(prompt_version)]
+                   + [str(row.get(k, "")) for k in _SCOPE_FIELDS[scope]])
+    return hashlib.sha1(sig.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    LLM answers in SQLite (one indexed table), opened once per run and
+    shared by all pages/threads. Entries expire ttl_s after they were
+    written (0 = never); past max_entries the least recently used go first.
+    A new database imports the legacy JSONL file once, if there is one.
+    readonly=True opens an existing database as is (sqlite mode=ro): no
+    table creation, import, expiry, LRU updates or eviction.
+    """
+
+    def __init__(self, path=DEF_DB, ttl_s=0, max_entries=0, legacy_jsonl=DEF_JSONL,
+                 readonly=False):
+        self.path = Path(path)
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.readonly = readonly
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if readonly:
+            self._db = sqlite3.connect(self.path.resolve().as_uri() + "?mode=ro", uri=True,
+                                       check_same_thread=False)
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fresh = not self.path.exists()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers (k TEXT PRIMARY KEY, root_cause TEXT, "
+            "recommendation TEXT, created REAL, used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_used ON answers(used)")
+        self._db.commit()
+        if fresh and legacy_jsonl and Path(legacy_jsonl).exists():
+            self.import_jsonl(legacy_jsonl)
+
+    def get(self, k):
+        """{"root_cause", "recommendation"} or None."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT root_cause, recommendation, created FROM answers WHERE k = ?", (k,)
+            ).fetchone()
+            if row and self.ttl_s and now - row[2] > self.ttl_s:
+                if not self.readonly:
+                    self._db.execute("DELETE FROM answers WHERE k = ?", (k,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            if not self.readonly:
+                self._db.execute("UPDATE answers SET used = ? WHERE k = ?", (now, k))
+            self.hits += 1
+            return {"root_cause": row[0], "recommendation": row[1]}
+
+    def lookup(self, row, scope="page", model="", prompt_version=1):
+        """get() by row; falls back to an imported legacy entry (and re-files it)."""
+        k = answer_key(row, scope, model, prompt_version)
+        got = self.get(k)
+        if got is None and scope == "page":
+            with self._lock:
+                old = self._db.execute(
+                    "SELECT root_cause, recommendation FROM answers WHERE k = ?",
+                    (legacy_key(row),),
+                ).fetchone()
+            if old:
+                got = {"root_cause": old[0], "recommendation": old[1]}
+                if not self.readonly:
+                    self.put(k, got)
+                self.misses -= 1
+                self.hits += 1
+        return got
+
+    def put(self, k, v):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+                (k, v.get("root_cause", ""), v.get("recommendation", ""), now, now),
+            )
+            self._db.commit()
+
+    def import_jsonl(self, path) -> int:
+        """Load a legacy llm_cache.jsonl (last line per key wins); returns keys imported."""
+        entries = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    obj = json.loads(line)
+                    entries[obj["k"]] = obj["v"]
+                except Exception:
+                    pass
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+                [(k, v.get("root_cause", ""), v.get("recommendation", ""), now, now)
+                 for k, v in entries.items()],
+            )
+            self._db.commit()
+        return len(entries)
+
+    def evict(self):
+        with self._lock:
+            if self.ttl_s:
+                self._db.execute("DELETE FROM answers WHERE created < ?", (time.time() - self.ttl_s,))
+            if self.max_entries:
+                self._db.execute(
+                    "DELETE FROM answers WHERE k IN (SELECT k FROM answers ORDER BY used DESC "
+                    "LIMIT -1 OFFSET ?)", (self.max_entries,)
+                )
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def close(self):
+        if not self.readonly:
+            self.evict()
+        with self._lock:
+            self._db.close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser("site-audit llm-cache", description="Maintain the LLM answer cache.")
+    ap.add_argument("action", choices=["compact", "stats", "evict"],
+                    help="compact = import the legacy JSONL into the SQLite cache (deduplicated); "
+                         "stats = entry count; evict = apply --ttl-days / --max-entries now.")
+    ap.add_argument("--db", default=DEF_DB)
+    ap.add_argument("--jsonl", default=DEF_JSONL)
+    ap.add_argument("--remove-jsonl", action="store_true",
+                    help="With compact: delete the JSONL file once imported.")
+    ap.add_argument("--ttl-days", type=float, default=0)
+    ap.add_argument("--max-entries", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    cache = LLMCache(args.db, ttl_s=args.ttl_days * 86400, max_entries=args.max_entries,
+                     legacy_jsonl=None)
+    try:
+        if args.action == "compact":
+            if not Path(args.jsonl).exists():
+                print(f"No legacy cache at {args.jsonl}")
+                return 1
+            with open(args.jsonl, "r", encoding="utf-8") as f:
+                lines = sum(1 for _ in f)
+            n = cache.import_jsonl(args.jsonl)
+            print(f"{lines} line(s) → {n} entr(ies) in {args.db}")
+            if args.remove_jsonl:
+                os.remove(args.jsonl)
+        elif args.action == "evict":
+            cache.evict()
+        print(f"{len(cache)} cached answer(s) in {args.db}")
+    finally:
+        cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,19 @@
 # D:\tintashProject\site_audit\llm_enrich.py
-import os, json, time, requests, re, hashlib
+import os, json, requests, re
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 
+from requests.adapters import HTTPAdapter
+
+from site_audit.llm_cache import LLMCache, answer_key
+from site_audit.politeness import TokenBucket
+
 # Defaults point at your LM Studio local server.
 # You can still override with --llm-base-url / --llm-model / --llm-api-key.
 DEF_BASE   = os.getenv("LLM_BASE_URL", "http://localhost:1234/v1")
 DEF_MODEL  = os.getenv("LLM_MODEL", "llama-3.2-3b-instruct")
 DEF_KEY    = os.getenv("LLM_API_KEY", None)
-CACHE_PATH = os.getenv("LLM_CACHE", "report/llm_cache.jsonl")
+PROMPT_VERSION = 1  # bump when _prompt / policy_msg change, so cached answers are re-asked
 
 
 def _clip(s: Any, n=400) -> str:
@@ -26,7 +32,12 @@ def _prompt(row: Dict[str, Any]) -> str:
         '{"root_cause":"...","recommendation":"..."}.\n'
         "Be specific, reference WCAG 2.1 AA correctly when relevant, "
         "and do not invent fake metrics or section numbers.\n\n"
-        f"Finding:\n"
+        f"Finding:\n" + _finding(row)
+    )
+
+
+def _finding(row: Dict[str, Any]) -> str:
+    return (
         f"page_url: {_clip(row.get('Page URL'), 200)}\n"
         f"category: {_clip(row.get('Category'), 120)}\n"
         f"rule_id: {_clip(row.get('Rule ID'), 120)}\n"
@@ -61,56 +72,99 @@ def _json_from_content(content: str) -> Dict[str, Any]:
     return {"root_cause": "", "recommendation": ""}
 
 
-def _call_openai_compatible(
-    prompt: str,
+_GUIDANCE = (
+    "Guidance for correctness:\n"
+    "- LCP: Say that LCP above ~2.5 seconds on mobile hurts perceived load speed. "
+    "Causes: large hero image, render-blocking CSS/JS, slow server response. "
+    "Fixes: compress/resize hero image, inline critical CSS, defer non-critical JS, use caching/CDN. "
+    "Do not tell them to 'use a faster network connection'. Do not claim WCAG sets an exact LCP time limit.\n"
+    "- CLS: Say layout shifts because elements load without reserved space. "
+    "Fixes: reserve width/height or aspect-ratio boxes for images/ads/embeds, avoid injecting banners above existing content. "
+    "Do NOT frame CLS as an accessibility/visual impairment issue.\n"
+    "- Color contrast: Refer to WCAG 2.1 AA Success Criterion 1.4.3 Contrast (Minimum). "
+    "Say text should have at least 4.5:1 contrast for normal text, 3:1 for large text. "
+    "Do NOT invent fake WCAG section numbers like '4.5.3' or '1.4.3.3'.\n"
+    "- Alt text: If missing alt, say 'Add meaningful alt text for informative images, and empty alt (alt=\"\") for decorative images.'\n"
+    "- Keep it practical, not legal.\n"
+)
+
+POLICY_MSG = (
+    "You output ONLY compact JSON like "
+    "{\"root_cause\":\"...\",\"recommendation\":\"...\"} "
+    "No prose before or after. No code blocks. No ```.\n"
+    "\n" + _GUIDANCE
+)
+
+# system message for batched requests: one object wrapping an array of answers
+BATCH_POLICY_MSG = (
+    "You are given several numbered findings. You output ONLY compact JSON like "
+    "{\"answers\":[{\"index\":0,\"root_cause\":\"...\",\"recommendation\":\"...\"},"
+    "{\"index\":1,\"root_cause\":\"...\",\"recommendation\":\"...\"}]} "
+    "with exactly one answer per finding, its index being the finding's number. "
+    "No prose before or after. No code blocks. No ```.\n"
+    "\n" + _GUIDANCE
+)
+
+
+_ANSWER = {
+    "type": "object",
+    "properties": {
+        "root_cause": {"type": "string"},
+        "recommendation": {"type": "string"},
+    },
+    "required": ["root_cause", "recommendation"],
+    "additionalProperties": False,
+}
+
+_BATCH_ANSWER = {
+    "type": "object",
+    "properties": {
+        "answers": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"index": {"type": "integer"}, **_ANSWER["properties"]},
+                "required": ["index", "root_cause", "recommendation"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["answers"],
+    "additionalProperties": False,
+}
+
+
+def _chat(
+    user: str,
+    schema_name: str,
+    schema: Dict[str, Any],
     base_url: str,
     model: str,
     api_key: Optional[str],
     temperature=0,
     max_tokens=200,
+    session=None,
+    system=POLICY_MSG,
 ):
     """
-    Try structured JSON first (response_format). If server doesn't support it,
-    fall back to a hard 'ONLY JSON' instruction.
+    One chat completion -> (content, error). Try structured JSON first
+    (response_format); if the server doesn't support it, fall back to a
+    hard 'ONLY JSON' instruction.
     """
 
     url = base_url.rstrip("/") + "/chat/completions"
 
-    policy_msg = (
-        "You output ONLY compact JSON like "
-        "{\"root_cause\":\"...\",\"recommendation\":\"...\"} "
-        "No prose before or after. No code blocks. No ```.\n"
-        "\n"
-        "Guidance for correctness:\n"
-        "- LCP: Say that LCP above ~2.5 seconds on mobile hurts perceived load speed. "
-        "Causes: large hero image, render-blocking CSS/JS, slow server response. "
-        "Fixes: compress/resize hero image, inline critical CSS, defer non-critical JS, use caching/CDN. "
-        "Do not tell them to 'use a faster network connection'. Do not claim WCAG sets an exact LCP time limit.\n"
-        "- CLS: Say layout shifts because elements load without reserved space. "
-        "Fixes: reserve width/height or aspect-ratio boxes for images/ads/embeds, avoid injecting banners above existing content. "
-        "Do NOT frame CLS as an accessibility/visual impairment issue.\n"
-        "- Color contrast: Refer to WCAG 2.1 AA Success Criterion 1.4.3 Contrast (Minimum). "
-        "Say text should have at least 4.5:1 contrast for normal text, 3:1 for large text. "
-        "Do NOT invent fake WCAG section numbers like '4.5.3' or '1.4.3.3'.\n"
-        "- Alt text: If missing alt, say 'Add meaningful alt text for informative images, and empty alt (alt=\"\") for decorative images.'\n"
-        "- Keep it practical, not legal.\n"
-    )
-
     # Attempt 1: ask for structured json via response_format (if the server supports it)
     schema_body = {
         "model": model,
         "messages": [
             {
                 "role": "system",
-                "content": policy_msg,
+                "content": system,
             },
             {
                 "role": "user",
-                "content": (
-                    prompt
-                    + "\nRespond ONLY as one JSON object with keys "
-                    '{"root_cause":"...","recommendation":"..."}'
-                ),
+                "content": user,
             },
         ],
         "temperature": temperature,
@@ -118,16 +172,8 @@ def _call_openai_compatible(
         "response_format": {
             "type": "json_schema",
             "json_schema": {
-                "name": "lh_finding",
-                "schema": {
-                    "type": "object",
-                    "properties": {
-                        "root_cause": {"type": "string"},
-                        "recommendation": {"type": "string"},
-                    },
-                    "required": ["root_cause", "recommendation"],
-                    "additionalProperties": False,
-                },
+                "name": schema_name,
+                "schema": schema,
             },
         },
     }
@@ -138,15 +184,13 @@ def _call_openai_compatible(
         "messages": [
             {
                 "role": "system",
-                "content": policy_msg,
+                "content": system,
             },
             {
                 "role": "user",
                 "content": (
-                    prompt
-                    + "\nRespond ONLY as one JSON object with keys "
-                    '{"root_cause":"...","recommendation":"..."} '
-                    "Do not include backticks. Do not include code fences. "
+                    user
+                    + " Do not include backticks. Do not include code fences. "
                     "Do not explain yourself."
                 ),
             },
@@ -157,20 +201,20 @@ def _call_openai_compatible(
     }
 
     last_err = ""
+    http = session or requests
 
     # Try schema-style first
     try:
-        r = requests.post(url, headers=_headers(api_key), json=schema_body, timeout=45)
+        r = http.post(url, headers=_headers(api_key), json=schema_body, timeout=45)
         r.raise_for_status()
         resp_json = r.json()
-        content = resp_json["choices"][0]["message"]["content"]
-        return _json_from_content(content)
+        return resp_json["choices"][0]["message"]["content"], ""
     except Exception as e:
         last_err = str(e)
 
     # Fallback plain style
     try:
-        r = requests.post(url, headers=_headers(api_key), json=text_body, timeout=45)
+        r = http.post(url, headers=_headers(api_key), json=text_body, timeout=45)
         r.raise_for_status()
         resp_json = r.json()
         raw_content = resp_json["choices"][0]["message"]["content"]
@@ -187,44 +231,232 @@ def _call_openai_compatible(
         else:
             content = raw_content
 
-        return _json_from_content(content)
+        return content, ""
     except Exception as e:
         last_err = str(e)
 
-    # If both attempts fail
-    return {"root_cause": "", "recommendation": "", "_error": last_err}
+    return None, last_err
 
 
-def _key(row: Dict[str, Any]) -> str:
-    """
-    Hash identifying columns so we can reuse the same
-    explanation next run without re-calling the model.
-    """
-    sig = "|".join(
-        str(row.get(k, "")) for k in ("Page URL", "Rule ID", "Title", "Example", "Severity")
+def _call_openai_compatible(
+    prompt: str,
+    base_url: str,
+    model: str,
+    api_key: Optional[str],
+    temperature=0,
+    max_tokens=200,
+    session=None,
+):
+    """One finding per request -> {"root_cause", "recommendation"} (plus "_error" on failure)."""
+    user = (
+        prompt
+        + "\nRespond ONLY as one JSON object with keys "
+        '{"root_cause":"...","recommendation":"..."}'
     )
-    return hashlib.sha1(sig.encode("utf-8")).hexdigest()
+    content, err = _chat(user, "lh_finding", _ANSWER, base_url, model, api_key,
+                         temperature, max_tokens, session)
+    if content is None:
+        # If both attempts fail
+        return {"root_cause": "", "recommendation": "", "_error": err}
+    return _json_from_content(content)
+
+
+def _batch_prompt(rows: List[Dict[str, Any]]) -> str:
+    parts = [
+        "You are a senior web performance & accessibility engineer.\n"
+        f"Given {len(rows)} Lighthouse findings, numbered from 0, return ONLY JSON "
+        '{"answers":[{"index":0,"root_cause":"...","recommendation":"..."}, ...]} '
+        "with exactly one answer per finding, in order.\n"
+        "Be specific, reference WCAG 2.1 AA correctly when relevant, "
+        "and do not invent fake metrics or section numbers.\n"
+    ]
+    for i, row in enumerate(rows):
+        parts.append(f"\nFinding {i}:\n" + _finding(row))
+    return "".join(parts)
 
 
-def _load_cache(path: str) -> Dict[str, Dict[str, Any]]:
-    d: Dict[str, Dict[str, Any]] = {}
+def _answers_from_content(content: str, n: int) -> List[Optional[Dict[str, Any]]]:
+    """
+    Batch reply -> answer per finding index; None where the reply had no
+    usable answer (missing, duplicated, out of range or empty).
+    """
+    data = None
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    obj = json.loads(line)
-                    d[obj["k"]] = obj["v"]
-                except Exception:
-                    pass
-    except FileNotFoundError:
-        pass
-    return d
+        data = json.loads(content)
+    except Exception:
+        m = re.search(r"\{.*\}|\[.*\]", content or "", re.S)
+        if m:
+            try:
+                data = json.loads(m.group(0))
+            except Exception:
+                pass
+    if isinstance(data, dict):
+        data = data.get("answers")
+    out: List[Optional[Dict[str, Any]]] = [None] * n
+    seen = set()
+    for pos, a in enumerate(data if isinstance(data, list) else []):
+        if not isinstance(a, dict):
+            continue
+        i = a.get("index", pos)
+        if not isinstance(i, int) or not 0 <= i < n or i in seen:
+            continue
+        seen.add(i)
+        root = str(a.get("root_cause", "") or "").strip()
+        rec = str(a.get("recommendation", "") or "").strip()
+        if root or rec:
+            out[i] = {"root_cause": root, "recommendation": rec}
+    return out
+
+
+def _call_openai_compatible_batch(
+    rows: List[Dict[str, Any]],
+    base_url: str,
+    model: str,
+    api_key: Optional[str],
+    temperature=0,
+    max_tokens_each=200,
+    session=None,
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Several findings in one request (one copy of the policy prompt);
+    answers mapped back by index, None for any the model didn't answer.
+    """
+    content, _ = _chat(_batch_prompt(rows), "lh_findings", _BATCH_ANSWER, base_url, model,
+                       api_key, temperature, max_tokens_each * len(rows), session,
+                       system=BATCH_POLICY_MSG)
+    if content is None:
+        return [None] * len(rows)
+    return _answers_from_content(content, len(rows))
+
+
+def _sanitize(rid: str, resp: Dict[str, Any]):
+    """Model answer -> (root cause, recommendation) with known junk cleaned up."""
+    root = str(resp.get("root_cause", "") or "").strip()
+    rec  = str(resp.get("recommendation", "") or "").strip()
+
+    # 3. sanitize obvious junk
+
+    # drop any code fences / ``` leftovers
+    for bad in ("```", "```python", "```json", "```js"):
+        root = root.replace(bad, "")
+        rec  = rec.replace(bad, "")
+
+    # collapse accidental repeats like "2.1 AA 2.1 AA"
+    root = re.sub(r"(2\.1 AA\s+)\1+", r"\1", root)
+    rec  = re.sub(r"(2\.1 AA\s+)\1+", r"\1", rec)
+
+    # ---------- COLOR CONTRAST CLEANUP ----------
+    if "color" in rid or "contrast" in rid:
+        # normalize ratio phrasing
+        root = root.replace("1.4.3:1", "4.5:1")
+        rec  = rec.replace("1.4.3:1", "4.5:1")
+
+        # force correct WCAG story if it's talking about contrast
+        if "contrast" in root.lower() and "4.5:1" not in root:
+            root += (
+                " Text contrast should be at least 4.5:1 for normal text "
+                "(WCAG 2.1 AA 1.4.3)."
+            )
+        if "contrast" in rec.lower() and "4.5:1" not in rec:
+            rec += (
+                " Aim for at least 4.5:1 contrast for normal text "
+                "(WCAG 2.1 AA 1.4.3)."
+            )
+
+        # kill fake section numbers like '1.4.3.3'
+        root = re.sub(r"1\.4\.3(\.\d+)+", "1.4.3", root)
+        rec  = re.sub(r"1\.4\.3(\.\d+)+", "1.4.3", rec)
+
+    # ---------- CLS CLEANUP ----------
+    if rid == "cumulative-layout-shift":
+        # Rewrite root to talk about layout jumps and reserved space.
+        # If it mentioned accessibility, hero image causes CLS, visual impairment, etc,
+        # we still normalize it to the stable CLS story.
+        if (
+            "accessib" in root.lower()
+            or "visual" in root.lower()
+            or "hero image" in root.lower()
+            or "cumulative layout shift" in root.lower()
+            or "cls" in root.lower()
+            or "shift" in root.lower()
+        ):
+            root = (
+                "Layout is jumping during load (high CLS). Elements like images, ads, "
+                "or banners are loading without reserved space, so content moves after "
+                "first paint."
+            )
+
+        if (
+            "accessib" in rec.lower()
+            or "visual" in rec.lower()
+            or "hero image" in rec.lower()
+            or "shift" in rec.lower()
+            or "cls" in rec.lower()
+        ):
+            rec = (
+                "Reserve explicit width/height or aspect-ratio boxes for images/ads/"
+                "embeds, and avoid injecting banners above existing content so the "
+                "page stays stable."
+            )
+
+    # ---------- LCP CLEANUP ----------
+    if rid == "largest-contentful-paint":
+        # Rewrite bad advice like 'use a faster network connection'.
+        if "faster network" in root.lower():
+            root = (
+                "Largest Contentful Paint (LCP) is above ~2.5s on mobile. Likely "
+                "causes: large hero image, render-blocking CSS/JS, or slow initial "
+                "server response."
+            )
+        if "faster network" in rec.lower():
+            rec = (
+                "Compress/resize hero images, inline critical CSS, defer non-critical "
+                "JS, and enable caching/CDN to get LCP under ~2.5s on mobile."
+            )
+
+        # Kill fake 'WCAG says 1.3s' style claims. WCAG does not define an LCP time limit.
+        if ("wcag" in root.lower() and "1.3" in root) or "wcag" in root.lower():
+            root = (
+                "Largest Contentful Paint (LCP) is slower than target (~2.5s on mobile). "
+                "Heavy hero media or render-blocking resources are delaying first "
+                "meaningful paint."
+            )
+        if ("wcag" in rec.lower() and "1.3" in rec) or "wcag" in rec.lower():
+            rec = (
+                "Compress/resize the main hero image (aim for a lightweight hero, "
+                "~100KB or less), inline critical CSS, defer non-critical JS, and use "
+                "CDN caching so above-the-fold content renders sooner."
+            )
+
+    return root, rec
+
+
+def make_session(max_in_flight: int = 1) -> requests.Session:
+    """Keep-alive session with a connection per in-flight request; reuse it across calls."""
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_in_flight))
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+def make_limiters(rate_limit_s: float = 0.25, rps: Optional[float] = None,
+                  tpm: Optional[float] = None):
+    """
+    (request bucket, token bucket) for `rps` requests/second (default
+    1/rate_limit_s) and `tpm` estimated tokens/minute; None where unlimited.
+    Build them once per run and pass them to every enrich_rows_llm call.
+    """
+    if rps is None:
+        rps = 1.0 / rate_limit_s if rate_limit_s else 0
+    req_bucket = TokenBucket(rps) if rps else None
+    tok_bucket = TokenBucket(tpm / 60.0, capacity=tpm) if tpm else None
+    return req_bucket, tok_bucket
 
 
-def _append_cache(path: str, k: str, v: Dict[str, Any]):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps({"k": k, "v": v}, ensure_ascii=False) + "\n")
+def _estimate_tokens(prompt: str, max_tokens: int) -> int:
+    # ~4 chars per token for the prompt + system policy, plus the answer budget
+    return (len(prompt) + 1500) // 4 + max_tokens
 
 
 def enrich_rows_llm(
@@ -233,7 +465,27 @@ def enrich_rows_llm(
     model: Optional[str] = None,
     api_key: Optional[str] = None,
     rate_limit_s: float = 0.25,
+    max_in_flight: int = 1,
+    rps: Optional[float] = None,
+    tpm: Optional[float] = None,
+    session: Optional[requests.Session] = None,
+    cache: Optional[LLMCache] = None,
+    key_scope: str = "page",
+    batch_size: int = 1,
+    limiters: Optional[tuple] = None,
 ) -> List[Dict[str, Any]]:
+    """
+    Fill Root Cause / Recommendation on rows from the LLM (cache first).
+    cache is the run's LLMCache (one is opened for this call if not given);
+    key_scope "content" shares answers between pages with the same finding.
+    Up to max_in_flight requests run at once over one pooled session; a
+    token bucket holds them to `rps` requests/second (default 1/rate_limit_s)
+    and, if set, `tpm` estimated tokens/minute; pass the run's make_limiters()
+    as `limiters` so those limits hold across calls. Rows with the same cache key
+    share one call. batch_size > 1 packs that many findings into each request
+    (one copy of the system prompt); findings the batch reply leaves out or
+    garbles get a call of their own. Returns rows, in input order.
+    """
 
     base_url = base_url or DEF_BASE
     model    = model    or DEF_MODEL
@@ -248,147 +500,115 @@ def enrich_rows_llm(
             r.setdefault("Recommendation", "")
         return rows
 
-    cache = _load_cache(CACHE_PATH)
-    out: List[Dict[str, Any]] = []
+    own_cache = cache is None
+    if own_cache:
+        cache = LLMCache()
 
+    # 1. if we already cached something, reuse it; one call per distinct key otherwise
+    todo: Dict[str, List[Dict[str, Any]]] = {}
     for r in rows:
-        k = _key(r)
-
-        # 1. if we already cached something, reuse it
-        if k in cache:
-            got = cache[k]
+        k = answer_key(r, key_scope, model, PROMPT_VERSION)
+        if k in todo:
+            todo[k].append(r)
+            continue
+        got = cache.lookup(r, key_scope, model, PROMPT_VERSION)
+        if got is not None:
             r["Root Cause"] = got.get("root_cause", "")
             r["Recommendation"] = got.get("recommendation", "")
-            out.append(r)
-            continue
+        else:
+            todo[k] = [r]
+    if not todo:
+        if own_cache:
+            cache.close()
+        return rows
+
+    req_bucket, tok_bucket = limiters or make_limiters(rate_limit_s, rps, tpm)
+    own_session = session is None
+    if own_session:
+        session = make_session(max_in_flight)
+
+    def store(k, resp):
+        r = todo[k][0]
+        root, rec = _sanitize(str(r.get("Rule ID", "")).lower(), resp)
+
+        # 4. stick sanitized text back on the rows
+        for row in todo[k]:
+            row["Root Cause"] = root
+            row["Recommendation"] = rec
+
+        # 5. write to cache (skip failed calls so they are retried next run)
+        if not resp.get("_error"):
+            cache.put(k, {"root_cause": root, "recommendation": rec})
+
+    def one(k):
+        prompt = _prompt(todo[k][0])
+        if req_bucket:
+            req_bucket.take()
+        if tok_bucket:
+            tok_bucket.take(_estimate_tokens(prompt, 200))
 
         # 2. call local model
-        resp = _call_openai_compatible(
-            _prompt(r),
-            base_url,
-            model,
-            api_key,
-            temperature=0,
-            max_tokens=200,
-        )
-
-        root = str(resp.get("root_cause", "") or "").strip()
-        rec  = str(resp.get("recommendation", "") or "").strip()
-
-        # 3. sanitize obvious junk
-
-        # drop any code fences / ``` leftovers
-        for bad in ("```", "```python", "```json", "```js"):
-            root = root.replace(bad, "")
-            rec  = rec.replace(bad, "")
-
-        # collapse accidental repeats like "2.1 AA 2.1 AA"
-        root = re.sub(r"(2\.1 AA\s+)\1+", r"\1", root)
-        rec  = re.sub(r"(2\.1 AA\s+)\1+", r"\1", rec)
-
-        rid = str(r.get("Rule ID", "")).lower()
-
-        # ---------- COLOR CONTRAST CLEANUP ----------
-        if "color" in rid or "contrast" in rid:
-            # normalize ratio phrasing
-            root = root.replace("1.4.3:1", "4.5:1")
-            rec  = rec.replace("1.4.3:1", "4.5:1")
-
-            # force correct WCAG story if it's talking about contrast
-            if "contrast" in root.lower() and "4.5:1" not in root:
-                root += (
-                    " Text contrast should be at least 4.5:1 for normal text "
-                    "(WCAG 2.1 AA 1.4.3)."
-                )
-            if "contrast" in rec.lower() and "4.5:1" not in rec:
-                rec += (
-                    " Aim for at least 4.5:1 contrast for normal text "
-                    "(WCAG 2.1 AA 1.4.3)."
-                )
-
-            # kill fake section numbers like '1.4.3.3'
-            root = re.sub(r"1\.4\.3(\.\d+)+", "1.4.3", root)
-            rec  = re.sub(r"1\.4\.3(\.\d+)+", "1.4.3", rec)
-
-        # ---------- CLS CLEANUP ----------
-        if rid == "cumulative-layout-shift":
-            # Rewrite root to talk about layout jumps and reserved space.
-            # If it mentioned accessibility, hero image causes CLS, visual impairment, etc,
-            # we still normalize it to the stable CLS story.
-            if (
-                "accessib" in root.lower()
-                or "visual" in root.lower()
-                or "hero image" in root.lower()
-                or "cumulative layout shift" in root.lower()
-                or "cls" in root.lower()
-                or "shift" in root.lower()
-            ):
-                root = (
-                    "Layout is jumping during load (high CLS). Elements like images, ads, "
-                    "or banners are loading without reserved space, so content moves after "
-                    "first paint."
-                )
-
-            if (
-                "accessib" in rec.lower()
-                or "visual" in rec.lower()
-                or "hero image" in rec.lower()
-                or "shift" in rec.lower()
-                or "cls" in rec.lower()
-            ):
-                rec = (
-                    "Reserve explicit width/height or aspect-ratio boxes for images/ads/"
-                    "embeds, and avoid injecting banners above existing content so the "
-                    "page stays stable."
-                )
-
-        # ---------- LCP CLEANUP ----------
-        if rid == "largest-contentful-paint":
-            # Rewrite bad advice like 'use a faster network connection'.
-            if "faster network" in root.lower():
-                root = (
-                    "Largest Contentful Paint (LCP) is above ~2.5s on mobile. Likely "
-                    "causes: large hero image, render-blocking CSS/JS, or slow initial "
-                    "server response."
-                )
-            if "faster network" in rec.lower():
-                rec = (
-                    "Compress/resize hero images, inline critical CSS, defer non-critical "
-                    "JS, and enable caching/CDN to get LCP under ~2.5s on mobile."
-                )
-
-            # Kill fake 'WCAG says 1.3s' style claims. WCAG does not define an LCP time limit.
-            if ("wcag" in root.lower() and "1.3" in root) or "wcag" in root.lower():
-                root = (
-                    "Largest Contentful Paint (LCP) is slower than target (~2.5s on mobile). "
-                    "Heavy hero media or render-blocking resources are delaying first "
-                    "meaningful paint."
-                )
-            if ("wcag" in rec.lower() and "1.3" in rec) or "wcag" in rec.lower():
-                rec = (
-                    "Compress/resize the main hero image (aim for a lightweight hero, "
-                    "~100KB or less), inline critical CSS, defer non-critical JS, and use "
-                    "CDN caching so above-the-fold content renders sooner."
-                )
-
-        # 4. stick sanitized text back on the row
-        r["Root Cause"] = root
-        r["Recommendation"] = rec
-
-        # 5. write to cache
-        _append_cache(
-            CACHE_PATH,
-            k,
-            {"root_cause": root, "recommendation": rec},
-        )
-
-        out.append(r)
-
-        # 6. throttle between calls so we don't hammer LM Studio
-        if rate_limit_s:
-            time.sleep(rate_limit_s)
+        store(k, _call_openai_compatible(prompt, base_url, model, api_key,
+                                         temperature=0, max_tokens=200, session=session))
+
+    def batch(keys):
+        if len(keys) == 1:
+            return one(keys[0])
+        group = [todo[k][0] for k in keys]
+        if req_bucket:
+            req_bucket.take()
+        if tok_bucket:
+            tok_bucket.take(_estimate_tokens(_batch_prompt(group), 200 * len(keys)))
+
+        answers = _call_openai_compatible_batch(group, base_url, model, api_key,
+                                                temperature=0, max_tokens_each=200,
+                                                session=session)
+        for k, resp in zip(keys, answers):
+            # 3. anything the batch reply didn't answer gets asked on its own
+            if resp is None:
+                one(k)
+            else:
+                store(k, resp)
+
+    keys = list(todo)
+    size = max(1, batch_size)
+    groups = [keys[i:i + size] for i in range(0, len(keys), size)]
 
-    return out
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+            list(pool.map(batch, groups))
+    finally:
+        if own_session:
+            session.close()
+        if own_cache:
+            cache.close()
+    return rows
 
 
-   
+def apply_cached_llm(
+    rows: List[Dict[str, Any]],
+    cache: Optional[LLMCache] = None,
+    model: Optional[str] = None,
+    key_scope: str = "page",
+) -> int:
+    """
+    Fill Root Cause / Recommendation from earlier LLM answers only (no calls),
+    on rows that don't have a recommendation yet. Returns rows filled.
+    """
+    own_cache = cache is None
+    if own_cache:
+        cache = LLMCache()
+    n = 0
+    try:
+        for r in rows:
+            if r.get("Recommendation"):
+                continue
+            got = cache.lookup(r, key_scope, model or DEF_MODEL, PROMPT_VERSION)
+            if got:
+                r["Root Cause"] = got.get("root_cause", "")
+                r["Recommendation"] = got.get("recommendation", "")
+                n += 1
+    finally:
+        if own_cache:
+            cache.close()
+    return n
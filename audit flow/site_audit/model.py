@@ -0,0 +1,96 @@
+# D:\tintashProject\site_audit\model.py
+import sys
+
+
+def _intern(s):
+    # rule ids, categories and titles repeat on every page of a site
+    return sys.intern(s) if isinstance(s, str) else s
+
+
+class Finding:
+    """One failing audit on a page; page-level metrics live on PageRecord."""
+    __slots__ = ("rule_id", "category", "title", "example", "score", "savings_ms",
+                 "savings_bytes", "severity", "root_cause", "recommendation")
+
+    def __init__(self, rule_id, category="", title="", example="", score=None,
+                 savings_ms=None, savings_bytes=None, severity=None, root_cause=None,
+                 recommendation=None):
+        self.rule_id = _intern(rule_id)
+        self.category = _intern(category)
+        self.title = _intern(title)
+        self.example = example
+        self.score = score
+        self.savings_ms = savings_ms
+        self.savings_bytes = savings_bytes
+        self.severity = _intern(severity)
+        self.root_cause = root_cause          # None = column not filled in (yet)
+        self.recommendation = recommendation
+
+    @classmethod
+    def from_row(cls, r):
+        return cls(r.get("Rule ID"), r.get("Category"), r.get("Title"), r.get("Example"),
+                   r.get("LH Score"), r.get("Savings (ms)"), r.get("Savings (bytes)"),
+                   r.get("Severity"), r.get("Root Cause"), r.get("Recommendation"))
+
+
+class PageRecord:
+    """
+    A page's metrics, held once, plus its findings. rows() gives back the
+    row dicts the rest of the pipeline (enrichment, CSV/XLSX) has always used.
+    Pages audited through a representative share its findings list.
+    """
+    __slots__ = ("url", "lcp", "cls", "tti", "findings", "audited_as")
+
+    def __init__(self, url, lcp=None, cls=None, tti=None, findings=None, audited_as=None):
+        self.url = url
+        self.lcp = lcp
+        self.cls = cls
+        self.tti = tti
+        self.findings = findings if findings is not None else []
+        self.audited_as = audited_as
+
+    @classmethod
+    def from_rows(cls, rows, url=None):
+        r0 = rows[0] if rows else {}
+        return cls(url or r0.get("Page URL", ""), r0.get("LCP"), r0.get("CLS"), r0.get("TTI"),
+                   [Finding.from_row(r) for r in rows], r0.get("Audited As"))
+
+    def alias(self, url):
+        """The record for a page that borrows this page's findings."""
+        return PageRecord(url, self.lcp, self.cls, self.tti, self.findings, self.url)
+
+    def severity_counts(self):
+        out = {}
+        for f in self.findings:
+            out[f.severity] = out.get(f.severity, 0) + 1
+        return out
+
+    def rows(self):
+        out = []
+        for f in self.findings:
+            r = {
+                "Page URL": self.url,
+                "Category": f.category,
+                "Rule ID": f.rule_id,
+                "Title": f.title,
+                "Example": f.example,
+                "LCP": self.lcp,
+                "CLS": self.cls,
+                "TTI": self.tti,
+                "LH Score": f.score,
+                "Savings (ms)": f.savings_ms,
+                "Savings (bytes)": f.savings_bytes,
+            }
+            if f.severity is not None:
+                r["Severity"] = f.severity
+            if f.root_cause is not None:
+                r["Root Cause"] = f.root_cause
+            if f.recommendation is not None:
+                r["Recommendation"] = f.recommendation
+            if self.audited_as is not None:
+                r["Audited As"] = self.audited_as
+            out.append(r)
+        return out
+
+    def __len__(self):
+        return len(self.findings)
@@ -1,9 +1,39 @@
 #D:\tintashProject\site_audit\parse.py
+import heapq
 
 def _metric(audits, key):
     a = audits.get(key, {})
     return a.get("numericValue")
 
+def _item_label(x):
+    src = x.get("source")
+    if isinstance(src, dict):
+        src = src.get("url")
+    return x.get("url") or (x.get("node") or {}).get("snippet") or src or ""
+
+def audit_savings(a: dict, top_k=5):
+    """
+    Estimated savings of one audit: {"ms", "bytes", "items"} where items are
+    the top_k offending (label, wastedMs, wastedBytes), worst first. ms/bytes
+    are LH's overallSavings*, else the sum over items; None if not reported.
+    """
+    details = a.get("details") or {}
+    items = details.get("items") if isinstance(details.get("items"), list) else []
+    wasted = [x for x in items if isinstance(x, dict) and ("wastedMs" in x or "wastedBytes" in x)]
+
+    def total(overall, key):
+        v = details.get(overall)
+        if v is None and any(key in x for x in wasted):
+            v = sum(x.get(key) or 0 for x in wasted)
+        return v
+
+    top = heapq.nlargest(top_k, wasted, key=lambda x: (x.get("wastedMs") or 0, x.get("wastedBytes") or 0))
+    return {
+        "ms": total("overallSavingsMs", "wastedMs"),
+        "bytes": total("overallSavingsBytes", "wastedBytes"),
+        "items": [(_item_label(x), x.get("wastedMs"), x.get("wastedBytes")) for x in top],
+    }
+
 def rows_from_lhr(lhr: dict):
     url = lhr.get("finalUrl","")
     audits = lhr.get("audits", {})
@@ -24,6 +54,7 @@ def rows_from_lhr(lhr: dict):
         if items:
             x = items[0]
             example = (x.get("node") or {}).get("snippet") or x.get("source") or ""
+        savings = audit_savings(a, top_k=0)
 
         rows.append({
             "Page URL": url,
@@ -35,5 +66,20 @@ def rows_from_lhr(lhr: dict):
             "CLS": _metric(audits, "cumulative-layout-shift"),
             "TTI": _metric(audits, "interactive"),
             "LH Score": score,
+            "Savings (ms)": savings["ms"],
+            "Savings (bytes)": savings["bytes"],
         })
     return rows
+
+def savings_from_lhr(lhr: dict, top_k=5):
+    """{rule id: audit_savings + title} for the failing audits that report any savings."""
+    out = {}
+    for aid, a in (lhr.get("audits") or {}).items():
+        score = a.get("score")
+        if not a.get("title") or (score is not None and score >= 1):
+            continue
+        sv = audit_savings(a, top_k)
+        if sv["ms"] is not None or sv["bytes"] is not None:
+            out[aid] = dict(sv, title=a.get("title"))
+    return out
+
@@ -0,0 +1,118 @@
+# D:\tintashProject\site_audit\politeness.py
+import email.utils, random, threading, time
+
+THROTTLE_STATUS = (429, 503)
+
+
+def parse_retry_after(value, now=None):
+    """Retry-After header (delta-seconds or HTTP-date) -> seconds, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+class AdaptiveThrottle:
+    """
+    Politeness controller for one origin.
+
+    The number of fetches allowed in flight is an AIMD window: +1/window per
+    healthy response (about +1 per round of requests), halved on 429/503,
+    cut to 3/4 on errors or when latency climbs to twice the best observed
+    level (the origin is queueing us). While the recent error rate (EWMA)
+    is above `error_hold`, healthy responses don't grow the window, so one
+    lucky answer between failures doesn't undo the cut. A Retry-After
+    pauses all new requests to the origin until it has passed.
+    """
+
+    def __init__(self, max_concurrency=4, min_concurrency=1, start=None,
+                 base_delay=1.0, max_delay=120.0, error_hold=0.2):
+        self.max = max(1, int(max_concurrency))
+        self.min = max(1, min(int(min_concurrency), self.max))
+        self.window = float(start if start is not None else max(self.min, self.max / 2))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.error_hold = error_hold
+        self.latency = None        # EWMA seconds
+        self.best_latency = None
+        self.error_rate = 0.0      # EWMA of throttled/failed responses
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def limit(self) -> int:
+        return max(self.min, int(self.window))
+
+    def wait(self) -> float:
+        """Seconds until new requests may be sent (0 = go)."""
+        return max(0.0, self.paused_until - time.monotonic())
+
+    def on_success(self, elapsed):
+        with self._lock:
+            self.error_rate *= 0.9
+            self.latency = elapsed if self.latency is None else 0.8 * self.latency + 0.2 * elapsed
+            if self.best_latency is None or self.latency < self.best_latency:
+                self.best_latency = self.latency
+            if self.latency > 2 * self.best_latency and self.window > self.min:
+                self.window = max(self.min, self.window * 0.75)
+            elif self.error_rate <= self.error_hold:
+                self.window = min(self.max, self.window + 1.0 / self.window)
+
+    def on_error(self):
+        with self._lock:
+            self.error_rate = 0.9 * self.error_rate + 0.1
+            self.window = max(self.min, self.window * 0.75)
+
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            self.error_rate = 0.9 * self.error_rate + 0.1
+            self.window = max(self.min, self.window / 2)
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def backoff(self, attempt, retry_after=None) -> float:
+        """Delay before retrying a throttled URL for the attempt-th time."""
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        d = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return d * random.uniform(0.5, 1.0)  # jitter so retries don't stampede
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens/second refill up to `capacity`
+    (the burst). take(n) blocks until n tokens are there; a request bigger
+    than the bucket waits for a full bucket and goes into debt, so it still
+    gets through at the long-run rate.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def take(self, n=1.0):
+        need = min(float(n), self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= need:
+                    self._tokens -= n
+                    return
+                wait = (need - self._tokens) / self.rate
+            self._sleep(wait)
@@ -0,0 +1,231 @@
+# D:\tintashProject\site_audit\regrade.py
+import argparse, hashlib, json, os, sys
+from pathlib import Path
+
+from site_audit.grade_pool import parse_reports
+from site_audit.lighthouse_runner import _slug
+from site_audit.lhr_store import SUFFIXES, find_reports
+from site_audit.llm_cache import LLMCache, SCOPES, DEF_DB
+from site_audit.llm_enrich import apply_cached_llm, DEF_MODEL
+from site_audit.model import PageRecord
+from site_audit.savings import SavingsIndex
+from site_audit.severity import SeverityMapper
+from site_audit.template_enrich import enrich_rows_template
+from site_audit.write_out import page_frames, write_csvs, write_savings_index
+try:
+    from site_audit.write_out import write_xlsx
+except Exception:
+    write_xlsx = None
+
+RULES_PATH = Path(__file__).resolve().parents[1] / "config" / "rules.yaml"
+PARSE_VERSION = 1  # bump when rows_from_lhr / savings_from_lhr output changes
+
+
+def _sha1(path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ParsedCache:
+    """
+    Ungraded parse results (grade_pool.parse_report) keyed by the SHA-1 of
+    the report file, in one JSON file. Files whose size and mtime haven't
+    changed since they were last hashed aren't read again.
+    """
+
+    def __init__(self, path, top_k=5):
+        self.path = Path(path)
+        self.top_k = top_k
+        self.hits = 0
+        self.misses = 0
+        try:
+            d = json.loads(self.path.read_text(encoding="utf-8"))
+            if d.get("version") != PARSE_VERSION or d.get("top_k") != top_k:
+                raise ValueError("stale")
+        except Exception:
+            d = {}
+        self.files = d.get("files", {})      # path -> [size, mtime_ns, sha1]
+        self.entries = d.get("entries", {})  # sha1 -> [rows, values, savings]
+
+    def digest(self, path) -> str:
+        st = os.stat(path)
+        f = self.files.get(str(path))
+        if f and f[0] == st.st_size and f[1] == st.st_mtime_ns:
+            return f[2]
+        h = _sha1(path)
+        self.files[str(path)] = [st.st_size, st.st_mtime_ns, h]
+        return h
+
+    def load(self, paths, workers=None):
+        """{path: (rows, values, savings)}; only new or changed files get parsed."""
+        out, todo = {}, []
+        for p in paths:
+            e = self.entries.get(self.digest(p))
+            if e is not None:
+                out[p] = e
+                self.hits += 1
+            else:
+                todo.append(p)
+        for p, res in parse_reports(todo, workers=workers, top_k=self.top_k):
+            self.misses += 1
+            if res is not None:
+                out[p] = self.entries[self.files[str(p)][2]] = list(res)
+        return out
+
+    def save(self, keep):
+        """Write the cache back, dropping files and entries not in keep."""
+        keep = {str(p) for p in keep}
+        self.files = {p: f for p, f in self.files.items() if p in keep}
+        live = {f[2] for f in self.files.values()}
+        self.entries = {h: e for h, e in self.entries.items() if h in live}
+        tmp = self.path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps({"version": PARSE_VERSION, "top_k": self.top_k,
+                                   "files": self.files, "entries": self.entries}),
+                       encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def _audited(src_dir):
+    """
+    (reports, crawled URL per report, rep) from a previous run's urls.txt;
+    every stored report if there is no urls.txt.
+    """
+    raw = src_dir / "raw_json"
+    urls_txt = src_dir / "urls.txt"
+    if not urls_txt.exists():
+        reports = find_reports(raw)
+        return reports, {p: str(p) for p in reports}, {}
+
+    reports, crawled, rep = [], {}, {}
+    for line in urls_txt.read_text(encoding="utf-8").splitlines():
+        parts = line.strip().split("\t")
+        if not parts[0]:
+            continue
+        if len(parts) == 3 and parts[2].startswith("="):
+            rep[parts[0]] = parts[2][1:]
+            continue
+        for suf in SUFFIXES.values():
+            p = raw / (_slug(parts[0]) + suf)
+            if p.exists():
+                reports.append(p)
+                crawled[p] = parts[0]
+                break
+    return sorted(reports), crawled, rep
+
+
+def regrade(src_dir, out_dir=None, rules_path=RULES_PATH, only_failing=False,
+            enrich_mode="hybrid", llm_cache=DEF_DB, llm_model=DEF_MODEL, llm_scope="page",
+            top_k=5, workers=None, xlsx=False, log=print):
+    """
+    Rebuild the CSV/XLSX outputs of a finished run from its stored reports:
+    severities from the current rules, template text, and LLM text from
+    the LLM cache only -- no crawling, Lighthouse or LLM calls.
+    llm_cache is the LLMCache path (None = no LLM text); it is only read,
+    and only if it exists.
+    """
+    src_dir = Path(src_dir)
+    out_dir = Path(out_dir or src_dir)
+    reports, crawled, rep = _audited(src_dir)
+    if not reports:
+        raise RuntimeError(f"no stored reports under {src_dir / 'raw_json'}")
+
+    cache = ParsedCache(src_dir / "parsed_cache.json", top_k=top_k)
+    parsed = cache.load(reports, workers)
+    cache.save(reports)
+    log(f"  {len(reports)} report(s): {cache.hits} cached, {cache.misses} parsed")
+
+    # grade every row of every page in one go
+    import pandas as pd
+    mapper = SeverityMapper.from_yaml(str(rules_path))
+    order = [p for p in reports if p in parsed]
+    flat = [(r, parsed[p][1].get(r["Rule ID"]) or [None, None]) for p in order for r in parsed[p][0]]
+    df = pd.DataFrame({
+        "Rule ID": [r["Rule ID"] for r, _ in flat],
+        "numericValue": [v[0] for _, v in flat],
+        "score": [v[1] for _, v in flat],
+    })
+    for (r, _), sev in zip(flat, mapper.grade_frame(df) if flat else []):
+        r["Severity"] = sev
+
+    all_pages, page_key = {}, {}
+    savings = SavingsIndex(top_k=top_k)
+    llm_filled = 0
+    answers = None
+    if llm_cache and enrich_mode in ("llm", "hybrid") and Path(llm_cache).exists():
+        answers = LLMCache(llm_cache, readonly=True)
+    for p in order:
+        rows, _, page_savings = parsed[p]
+        savings.add(crawled.get(p, str(p)), page_savings)
+        if only_failing:
+            rows = [r for r in rows if str(r.get("Severity", "low")) in ("medium", "critical")]
+        if not rows:
+            continue
+        if enrich_mode in ("template", "hybrid"):
+            rows = enrich_rows_template(rows)
+        if answers is not None:
+            llm_filled += apply_cached_llm(rows, answers, llm_model, llm_scope)
+
+        page_url = rows[0].get("Page URL", "UNKNOWN_PAGE")
+        if page_url in all_pages:
+            all_pages[page_url].findings.extend(PageRecord.from_rows(rows).findings)
+        else:
+            all_pages[page_url] = PageRecord.from_rows(rows, page_url)
+        page_key[crawled.get(p, page_url)] = page_url
+
+    if answers is not None:
+        answers.close()
+
+    for u, src in rep.items():
+        page = all_pages.get(page_key.get(src, src))
+        if page:
+            all_pages[u] = page.alias(u)
+
+    if llm_filled:
+        log(f"  LLM cache: text for {llm_filled} row(s)")
+    log(f"Writing outputs → {out_dir}")
+    frames = page_frames(all_pages)  # shared by the CSV and XLSX writers
+    write_csvs(all_pages, out_dir, frames)
+    savings_rows = savings.rows()
+    write_savings_index(savings_rows, out_dir)
+    if xlsx and write_xlsx:
+        write_xlsx(all_pages, out_dir / "workbook.xlsx", savings_rows, frames)
+    return all_pages
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser("site-audit regrade",
+                                 description="Re-grade a finished run from its stored reports "
+                                             "(no crawl, no Lighthouse, no LLM calls).")
+    ap.add_argument("--from", dest="src", default="report",
+                    help="Output folder of an earlier run (with raw_json/ and urls.txt).")
+    ap.add_argument("--out", default=None, help="Where to write CSV/XLSX (default: --from).")
+    ap.add_argument("--rules", default=str(RULES_PATH))
+    ap.add_argument("--only-failing", action="store_true",
+                    help="Drop rows graded 'low' (keep only medium/critical).")
+    ap.add_argument("--enrich-mode", choices=["template", "llm", "hybrid"], default="hybrid",
+                    help="template = rule text only; llm = cached LLM text only; "
+                         "hybrid = template first, then cached LLM text fills blanks.")
+    ap.add_argument("--llm-cache", default=DEF_DB, help="SQLite cache of LLM answers.")
+    ap.add_argument("--no-llm-cache", action="store_true", help="Don't apply cached LLM answers.")
+    ap.add_argument("--llm-model", default=DEF_MODEL,
+                    help="Model whose cached answers to use (part of the cache key).")
+    ap.add_argument("--llm-cache-scope", choices=SCOPES, default="page")
+    ap.add_argument("--savings-top-k", type=int, default=5)
+    ap.add_argument("--parse-workers", type=int, default=0)
+    ap.add_argument("--xlsx", action="store_true", help="Also write workbook.xlsx")
+    args = ap.parse_args(argv)
+
+    regrade(args.src, args.out, args.rules, only_failing=args.only_failing,
+            enrich_mode=args.enrich_mode,
+            llm_cache=None if args.no_llm_cache else args.llm_cache,
+            llm_model=args.llm_model, llm_scope=args.llm_cache_scope,
+            top_k=args.savings_top_k, workers=args.parse_workers or None, xlsx=args.xlsx)
+    print("Done.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# D:\tintashProject\site_audit\render.py
+import argparse, html, json, os, subprocess, sys
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+from site_audit.lighthouse_runner import _find, _find_lighthouse
+from site_audit.lhr_store import find_reports, html_path, read_lhr_bytes
+
+# renders every {"lhr": ..., "out": ...} line on stdin with Lighthouse's own
+# report generator (ESM in LH >= 10, CommonJS before)
+_RENDER_JS = r"""
+const fs = require('fs'), url = require('url'), rl = require('readline');
+import(url.pathToFileURL(process.argv[1]).href).then(async m => {
+  const RG = m.ReportGenerator || (m.default && (m.default.ReportGenerator || m.default));
+  for await (const line of rl.createInterface({input: process.stdin})) {
+    if (!line.trim()) continue;
+    const job = JSON.parse(line);
+    fs.writeFileSync(job.out, RG.generateReportHtml(job.lhr));
+  }
+}).catch(e => { console.error(e && e.stack || e); process.exit(1); });
+"""
+
+
+def _lighthouse_root():
+    """Directory of the installed lighthouse npm package, or None."""
+    env = os.getenv("LIGHTHOUSE_ROOT")
+    if env and os.path.isdir(env):
+        return Path(env)
+    lh = _find_lighthouse()
+    if lh:
+        # unix: bin/lighthouse -> lib/node_modules/lighthouse/cli/index.js
+        for p in Path(os.path.realpath(lh)).parents:
+            if (p / "package.json").exists() and p.name == "lighthouse":
+                return p
+        # windows: npm/lighthouse.cmd next to npm/node_modules/lighthouse
+        cand = Path(lh).parent / "node_modules" / "lighthouse"
+        if cand.is_dir():
+            return cand
+    npm = _find(["npm", "npm.cmd"])
+    if npm:
+        try:
+            root = subprocess.run([npm, "root", "-g"], capture_output=True, text=True,
+                                  timeout=30).stdout.strip()
+        except Exception:
+            root = ""
+        if root and (Path(root) / "lighthouse").is_dir():
+            return Path(root) / "lighthouse"
+    return None
+
+
+def _generator():
+    node = _find(["node", "node.exe"])
+    root = _lighthouse_root()
+    gen = root / "report" / "generator" / "report-generator.js" if root else None
+    if not node or not gen or not gen.exists():
+        raise RuntimeError(
+            "rendering needs node and a global lighthouse install (`npm i -g lighthouse`); "
+            "set LIGHTHOUSE_ROOT to the lighthouse package dir if it lives elsewhere."
+        )
+    return [node, "-e", _RENDER_JS, str(gen)]
+
+
+def is_fresh(report) -> bool:
+    """The HTML next to report exists and is not older than the report."""
+    out = html_path(report)
+    return out.exists() and out.stat().st_mtime >= Path(report).stat().st_mtime
+
+
+def render_reports(reports, force=False, log=lambda *a, **k: None) -> list:
+    """
+    Write <slug>.report.html next to each stored report (any lhr_store
+    format) that doesn't have an up-to-date one, in a single node process.
+    Returns the HTML paths, in input order.
+    """
+    reports = [Path(r) for r in reports]
+    stale = [r for r in reports if force or not is_fresh(r)]
+    if stale:
+        jobs = []
+        for r in stale:
+            lhr = json.loads(read_lhr_bytes(r).decode("utf-8"))
+            jobs.append(json.dumps({"lhr": lhr, "out": str(html_path(r))}))
+        proc = subprocess.run(_generator(), input="\n".join(jobs), capture_output=True,
+                              text=True, encoding="utf-8")
+        if proc.returncode != 0:
+            raise RuntimeError("report render failed: " + (proc.stderr or "").strip()[-500:])
+        log(f"  rendered {len(stale)} report(s), {len(reports) - len(stale)} cached")
+    return [html_path(r) for r in reports]
+
+
+def _index_page(reports) -> bytes:
+    items = "\n".join(
+        f'<li><a href="/{quote(html_path(r).name)}">{html.escape(r.name)}</a>'
+        + (" (rendered)" if is_fresh(r) else "") + "</li>"
+        for r in reports
+    )
+    return (f"<!doctype html><meta charset=utf-8><title>site-audit reports</title>"
+            f"<h1>{len(reports)} report(s)</h1><ul>\n{items}\n</ul>").encode("utf-8")
+
+
+def serve(raw_dir, host="127.0.0.1", port=8000, log=print):
+    """
+    Local report browser: / lists the stored reports, each link renders its
+    HTML on first request and serves the cached file after that.
+    """
+    raw_dir = Path(raw_dir)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, body, ctype="text/html; charset=utf-8"):
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            name = unquote(self.path.split("?", 1)[0].lstrip("/"))
+            reports = find_reports(raw_dir)
+            if not name:
+                return self._send(200, _index_page(reports))
+            match = [r for r in reports if html_path(r).name == name]
+            if not match:
+                return self._send(404, b"not found", "text/plain")
+            try:
+                out = render_reports(match, log=log)[0]
+            except Exception as e:
+                return self._send(500, str(e).encode("utf-8"), "text/plain; charset=utf-8")
+            self._send(200, out.read_bytes())
+
+        def log_message(self, *a):
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    log(f"Serving {raw_dir} on http://{host}:{httpd.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser("site-audit render",
+                                 description="Build Lighthouse HTML reports from stored JSON on demand.")
+    ap.add_argument("path", nargs="+",
+                    help="Report files, or folders (an audit --out folder or its raw_json/).")
+    ap.add_argument("--force", action="store_true", help="Re-render even if the HTML is up to date.")
+    ap.add_argument("--serve", action="store_true",
+                    help="Start a local server that renders each report when it is opened.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    args = ap.parse_args(argv)
+
+    reports = []
+    for p in map(Path, args.path):
+        if p.is_dir():
+            reports += find_reports(p / "raw_json" if (p / "raw_json").is_dir() else p)
+        else:
+            reports.append(p)
+
+    if args.serve:
+        d = Path(args.path[0])
+        serve(d / "raw_json" if (d / "raw_json").is_dir() else d, args.host, args.port)
+        return 0
+
+    if not reports:
+        print("No reports found.")
+        return 1
+    for out in render_reports(reports, force=args.force, log=print):
+        print(out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+# D:\tintashProject\site_audit\savings.py
+import heapq
+
+
+class SavingsIndex:
+    """
+    Cross-page totals of estimated savings per rule, from savings_from_lhr
+    results of the audited pages, plus the top_k worst offending items
+    site-wide (a bounded heap per rule, so memory doesn't grow with pages).
+    """
+
+    def __init__(self, top_k=5):
+        self.top_k = top_k
+        self.rules = {}  # rule id -> {"title", "pages", "ms", "bytes", "top": heap}
+
+    def add(self, page_url, savings):
+        for aid, sv in savings.items():
+            e = self.rules.setdefault(aid, {"title": sv.get("title") or "",
+                                            "pages": 0, "ms": 0.0, "bytes": 0.0, "top": []})
+            e["pages"] += 1
+            e["ms"] += sv["ms"] or 0
+            e["bytes"] += sv["bytes"] or 0
+            for label, ms, by in sv["items"]:
+                entry = (ms or 0, by or 0, page_url, label)
+                if len(e["top"]) < self.top_k:
+                    heapq.heappush(e["top"], entry)
+                elif self.top_k:
+                    heapq.heappushpop(e["top"], entry)
+
+    def rows(self):
+        """One row per rule, biggest estimated time saving first (then bytes)."""
+        out = []
+        for aid, e in self.rules.items():
+            top = sorted(e["top"], reverse=True)
+            out.append({
+                "Rule ID": aid,
+                "Title": e["title"],
+                "Pages": e["pages"],
+                "Total Savings (ms)": round(e["ms"]),
+                "Total Savings (KiB)": round(e["bytes"] / 1024, 1),
+                "Avg Savings per Page (ms)": round(e["ms"] / e["pages"]) if e["pages"] else 0,
+                "Top Items": "; ".join(
+                    f"{label or page} ({ms:.0f} ms, {by / 1024:.1f} KiB)" for ms, by, page, label in top
+                ),
+            })
+        out.sort(key=lambda r: (r["Total Savings (ms)"], r["Total Savings (KiB)"]), reverse=True)
+        return out
+
+    def __len__(self):
+        return len(self.rules)
@@ -0,0 +1,189 @@
+# D:\tintashProject\site_audit\seenset.py
+"""
+Memory-compact alternatives to a set of URL strings for the crawl frontier.
+
+HashedSet  - exact on 64-bit fingerprints (collisions are astronomically
+             rare), 8 bytes per slot in an open-addressing array.
+BloomSet   - scalable Bloom filter: grows by adding filters with tighter
+             error rates, so the total false-positive rate stays under the
+             configured bound however many URLs arrive. A false positive
+             means a URL is wrongly treated as seen (never crawled).
+"""
+import hashlib, math
+from array import array
+from pathlib import Path
+
+
+def _fp64(s: str) -> int:
+    v = int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+    return v or 1  # 0 marks an empty slot
+
+
+class HashedSet:
+    kind = "hashed"
+
+    def __init__(self, capacity=1024):
+        cap = 1
+        while cap < capacity * 2:
+            cap <<= 1
+        self._slots = array("Q", bytes(8 * cap))
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def _find(self, slots, fp):
+        mask = len(slots) - 1
+        i = fp & mask
+        while True:
+            v = slots[i]
+            if v == 0 or v == fp:
+                return i
+            i = (i + 1) & mask
+
+    def __contains__(self, url):
+        fp = _fp64(url)
+        return self._slots[self._find(self._slots, fp)] == fp
+
+    def add(self, url):
+        self._add_fp(_fp64(url))
+
+    def _add_fp(self, fp):
+        i = self._find(self._slots, fp)
+        if self._slots[i] == fp:
+            return
+        self._slots[i] = fp
+        self._n += 1
+        if self._n * 10 > len(self._slots) * 7:  # keep load under 0.7
+            self._grow()
+
+    def _grow(self):
+        old = self._slots
+        self._slots = array("Q", bytes(16 * len(old)))
+        for fp in old:
+            if fp:
+                self._slots[self._find(self._slots, fp)] = fp
+
+    def save(self, path):
+        Path(path).write_bytes(self._slots.tobytes())
+
+    @classmethod
+    def load(cls, path, meta):
+        s = cls()
+        s._slots = array("Q")
+        s._slots.frombytes(Path(path).read_bytes())
+        s._n = meta.get("n", sum(1 for v in s._slots if v))
+        return s
+
+    def meta(self):
+        return {"kind": self.kind, "n": self._n}
+
+
+class _Bloom:
+    def __init__(self, capacity, fp_rate):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        m = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.m = m
+        self.k = max(1, round(m / capacity * math.log(2)))
+        self.bits = bytearray((m + 7) // 8)
+        self.n = 0
+
+    def _idx(self, h1, h2):
+        for i in range(self.k):
+            yield (h1 + i * h2) % self.m
+
+    def contains(self, h1, h2):
+        return all(self.bits[j >> 3] & (1 << (j & 7)) for j in self._idx(h1, h2))
+
+    def add(self, h1, h2):
+        for j in self._idx(h1, h2):
+            self.bits[j >> 3] |= 1 << (j & 7)
+        self.n += 1
+
+
+class BloomSet:
+    kind = "bloom"
+
+    def __init__(self, fp_rate=1e-6, capacity=100_000, growth=4, tightening=0.5):
+        self.fp_rate = fp_rate
+        self.growth = growth
+        self.tightening = tightening
+        self._first_capacity = capacity
+        self._filters = []
+        self._n = 0
+        self._add_filter()
+
+    def _add_filter(self):
+        i = len(self._filters)
+        # error budgets r0, r0*t, r0*t^2 ... sum to fp_rate
+        r = self.fp_rate * (1 - self.tightening) * (self.tightening ** i)
+        self._filters.append(_Bloom(self._first_capacity * (self.growth ** i), r))
+
+    @staticmethod
+    def _hashes(url):
+        d = hashlib.blake2b(url.encode("utf-8"), digest_size=16).digest()
+        return int.from_bytes(d[:8], "little"), int.from_bytes(d[8:], "little") | 1
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, url):
+        h1, h2 = self._hashes(url)
+        return any(f.contains(h1, h2) for f in self._filters)
+
+    def add(self, url):
+        h1, h2 = self._hashes(url)
+        if any(f.contains(h1, h2) for f in self._filters):
+            return
+        if self._filters[-1].n >= self._filters[-1].capacity:
+            self._add_filter()
+        self._filters[-1].add(h1, h2)
+        self._n += 1
+
+    def meta(self):
+        return {
+            "kind": self.kind, "n": self._n, "fp_rate": self.fp_rate,
+            "growth": self.growth, "tightening": self.tightening,
+            "capacity": self._first_capacity,
+            "filters": [[f.capacity, f.fp_rate, f.n] for f in self._filters],
+        }
+
+    def save(self, path):
+        with open(path, "wb") as fh:
+            for f in self._filters:
+                fh.write(f.bits)
+
+    @classmethod
+    def load(cls, path, meta):
+        s = cls(meta["fp_rate"], meta["capacity"], meta["growth"], meta["tightening"])
+        s._filters = []
+        data = memoryview(Path(path).read_bytes())
+        pos = 0
+        for cap, rate, n in meta["filters"]:
+            f = _Bloom(cap, rate)
+            f.bits = bytearray(data[pos:pos + len(f.bits)])
+            f.n = n
+            pos += len(f.bits)
+            s._filters.append(f)
+        s._n = meta["n"]
+        return s
+
+
+def make_seen(kind="exact", fp_rate=1e-6):
+    if kind == "hashed":
+        return HashedSet()
+    if kind == "bloom":
+        return BloomSet(fp_rate=fp_rate)
+    return set()
+
+
+def save_seen(seen, path):
+    """Write a HashedSet/BloomSet next to a checkpoint; returns its metadata."""
+    seen.save(path)
+    return seen.meta()
+
+
+def load_seen(path, meta):
+    kinds = {"hashed": HashedSet, "bloom": BloomSet}
+    return kinds[meta["kind"]].load(path, meta)
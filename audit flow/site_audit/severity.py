@@ -1,29 +1,67 @@
 #D:\tintashProject\site_audit\severity.py
 
+import operator
+
 import yaml
 
+_OPS = {">=": operator.ge, ">": operator.gt, "<=": operator.le, "<": operator.lt}
+LEVELS = ("critical", "medium")
+
 def _parse_threshold(expr):
-    # supports ">=4000", ">=0.25", or plain numbers
-    if isinstance(expr, str) and expr.startswith(">="):
-        return float(expr[2:])
-    return float(expr)
-
-def _grade_threshold(v, crit_expr, med_expr, default_level):
-    if v is None:
-        return default_level
-    crit_v = _parse_threshold(crit_expr)
-    med_v  = _parse_threshold(med_expr)
-    if v >= crit_v:
-        return "critical"
-    if v >= med_v:
-        return "medium"
-    return "low"
+    # supports ">=4000", "<=0.5", ">0.1", or plain numbers (meaning >=)
+    if isinstance(expr, str):
+        s = expr.strip()
+        for op in (">=", "<=", ">", "<"):
+            if s.startswith(op):
+                return op, float(s[len(op):])
+    return ">=", float(expr)
+
+def _compile_level(expr):
+    """None/False = never, True = always, else a (compare, value) threshold."""
+    if expr is None or expr is False:
+        return None
+    if expr is True:
+        return True
+    op, v = _parse_threshold(expr)
+    return _OPS[op], v
+
+def _compile_rule(rule):
+    """
+    rules.yaml entry -> (field, crit, med):
+      true                                  -> medium
+      {crit: true} / {med: true}            -> fixed level
+      {crit: ">=4000", med: ">=2500"}       -> thresholds on the audit's numericValue
+      {crit: "<=0.5", med: "<=0.9", on: score}  -> thresholds on its score
+    """
+    if rule is True:
+        return "numericValue", None, True
+    if not isinstance(rule, dict):
+        return None
+    return rule.get("on", "numericValue"), _compile_level(rule.get("crit")), _compile_level(rule.get("med"))
+
+def _grade_value(compiled, v, default_level):
+    _, crit, med = compiled
+    measured = False
+    for level, test in zip(LEVELS, (crit, med)):
+        if test is None:
+            continue
+        if test is True:
+            return level
+        if v is None:
+            continue
+        measured = True
+        if test[0](v, test[1]):
+            return level
+    return "low" if measured else default_level
 
 class SeverityMapper:
     def __init__(self, cfg):
         self.cfg = cfg or {}
         self.rules = (self.cfg.get("rules") or {})
         self.default = (self.cfg.get("defaults") or "low")
+        # thresholds are parsed once here, not per row
+        self.table = {aid: c for aid, c in ((a, _compile_rule(r)) for a, r in self.rules.items())
+                      if c is not None}
 
     @classmethod
     def from_yaml(cls, path):
@@ -31,32 +69,53 @@ class SeverityMapper:
             return cls(yaml.safe_load(f))
 
     def grade(self, row, audits):
-        aid = row["Rule ID"]
-        rule = self.rules.get(aid)
-        if not rule:
+        c = self.table.get(row["Rule ID"])
+        if c is None:
             return self.default
+        return _grade_value(c, (audits.get(row["Rule ID"]) or {}).get(c[0]), self.default)
+
+    def grade_many(self, rows, audits):
+        """Severity for each of one page's rows, in order."""
+        table, default = self.table, self.default
+        out = []
+        for r in rows:
+            c = table.get(r["Rule ID"])
+            out.append(default if c is None else
+                       _grade_value(c, (audits.get(r["Rule ID"]) or {}).get(c[0]), default))
+        return out
+
+    def grade_frame(self, df):
+        """
+        Grade a whole findings table at once (any number of pages).
+        df needs "Rule ID" plus "numericValue" and "score" columns holding each
+        row's own audit values; returns a Series of severities on df's index.
+        """
+        import numpy as np
+        import pandas as pd
 
-        # numeric thresholds
-        if "crit" in rule or "med" in rule:
-            if aid == "largest-contentful-paint":
-                v = audits.get("largest-contentful-paint", {}).get("numericValue")
-                return _grade_threshold(v, rule.get("crit"), rule.get("med"), self.default)
-
-            if aid == "cumulative-layout-shift":
-                v = audits.get("cumulative-layout-shift", {}).get("numericValue")
-                return _grade_threshold(v, rule.get("crit"), rule.get("med"), self.default)
-
-            # future:
-            # if aid == "interactive":
-            #     v = audits.get("interactive", {}).get("numericValue")
-            #     return _grade_threshold(v, rule.get("crit"), rule.get("med"), self.default)
-
-        # boolean rules
-        if isinstance(rule, dict) and rule.get("crit") is True:
-            return "critical"
-        if isinstance(rule, dict) and rule.get("med") is True:
-            return "medium"
-        if rule is True:
-            return "medium"
-
-        return self.default
+        out = pd.Series(self.default, index=df.index, dtype=object)
+        rid = df["Rule ID"]
+        for aid in rid[rid.isin(self.table.keys())].unique():
+            field, crit, med = self.table[aid]
+            mask = (rid == aid).to_numpy()
+            v = pd.to_numeric(df.loc[mask, field], errors="coerce").to_numpy(dtype=float)
+            known = ~np.isnan(v)
+            got = np.full(len(v), None, dtype=object)
+            numeric = False
+            for level, test in zip(LEVELS, (crit, med)):
+                if test is None:
+                    continue
+                if test is True:
+                    got[pd.isna(got)] = level
+                    break
+                numeric = True
+                hit = known & np.asarray(test[0](np.where(known, v, 0.0), test[1]))
+                got[pd.isna(got) & hit] = level
+            rest = pd.isna(got)
+            if numeric:
+                got[rest & known] = "low"
+                got[rest & ~known] = self.default
+            else:
+                got[rest] = self.default
+            out[mask] = got
+        return out
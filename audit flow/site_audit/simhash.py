@@ -0,0 +1,94 @@
+# D:\tintashProject\site_audit\simhash.py
+import hashlib
+
+BITS = 64
+
+
+def _h64(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(tokens) -> int:
+    """
+    64-bit SimHash of a bag of tokens (dict/Counter of token -> weight, or any
+    iterable of tokens). Pages that share most tokens land a few bits apart.
+    """
+    if not hasattr(tokens, "items"):
+        counts = {}
+        for t in tokens:
+            counts[t] = counts.get(t, 0) + 1
+        tokens = counts
+
+    v = [0] * BITS
+    for tok, w in tokens.items():
+        h = _h64(tok)
+        for i in range(BITS):
+            if (h >> i) & 1:
+                v[i] += w
+            else:
+                v[i] -= w
+    fp = 0
+    for i in range(BITS):
+        if v[i] > 0:
+            fp |= 1 << i
+    return fp
+
+
+def distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def max_distance(similarity: float) -> int:
+    """Similarity in [0, 1] -> largest Hamming distance that still counts."""
+    return max(0, int((1.0 - similarity) * BITS))
+
+
+class SimHashIndex:
+    """
+    Finds a stored fingerprint within max_dist bits of a query. The 64 bits are
+    cut into max_dist + 1 bands; by pigeonhole any match agrees exactly on at
+    least one band, so lookups only compare against that band's bucket.
+    """
+
+    def __init__(self, max_dist=3):
+        self.k = max(0, int(max_dist))
+        nb = min(self.k + 1, BITS)
+        size = BITS // nb
+        self.bands = [(i * size, BITS if i == nb - 1 else (i + 1) * size) for i in range(nb)]
+        self.tables = [{} for _ in self.bands]
+
+    def _keys(self, fp):
+        for lo, hi in self.bands:
+            yield (fp >> lo) & ((1 << (hi - lo)) - 1)
+
+    def find(self, fp):
+        """Key of the first stored fingerprint within k bits of fp, else None."""
+        for table, band in zip(self.tables, self._keys(fp)):
+            for other, key in table.get(band, ()):
+                if distance(fp, other) <= self.k:
+                    return key
+        return None
+
+    def add(self, key, fp):
+        for table, band in zip(self.tables, self._keys(fp)):
+            table.setdefault(band, []).append((fp, key))
+
+
+def near_duplicates(urls, fingerprints, max_dist=3):
+    """
+    Walk urls in order; each one within max_dist bits of an earlier kept page
+    becomes an alias of it. Returns {alias: canonical}. Pages without a
+    fingerprint are always kept.
+    """
+    idx = SimHashIndex(max_dist)
+    alias = {}
+    for u in urls:
+        fp = fingerprints.get(u)
+        if fp is None:
+            continue
+        canon = idx.find(fp)
+        if canon is not None:
+            alias[u] = canon
+        else:
+            idx.add(u, fp)
+    return alias
@@ -0,0 +1,126 @@
+# D:\tintashProject\site_audit\sitemap.py
+import urllib.parse, urllib.robotparser, zlib
+import xml.etree.ElementTree as ET
+
+ROBOTS_AGENT = "site-audit"  # token matched against robots.txt groups
+
+
+def _local(tag):
+    # "{http://www.sitemaps.org/schemas/sitemap/0.9}loc" -> "loc"
+    return tag.rsplit("}", 1)[-1]
+
+
+def load_robots(sess, origin, timeout=25, log=lambda *a, **k: None):
+    """
+    Fetch and parse <origin>/robots.txt. Returns (RobotFileParser, sitemap urls).
+    A missing or broken robots.txt means "allow everything, no sitemaps".
+    """
+    p = urllib.parse.urlsplit(origin)
+    robots_url = urllib.parse.urlunsplit((p.scheme, p.netloc, "/robots.txt", "", ""))
+    rp = urllib.robotparser.RobotFileParser(robots_url)
+    try:
+        r = sess.get(robots_url, timeout=timeout)
+        if r.status_code >= 400:
+            rp.parse([])
+        else:
+            rp.parse(r.text.splitlines())
+    except Exception as e:
+        log(f"robots.txt error {robots_url}: {e}")
+        rp.parse([])
+    return rp, list(rp.site_maps() or [])
+
+
+def _iter_xml_chunks(r, chunk_size=64 * 1024):
+    """Body chunks of a sitemap response, gunzipping .xml.gz on the fly."""
+    inflate = None
+    for chunk in r.iter_content(chunk_size=chunk_size):
+        if not chunk:
+            continue
+        if inflate is None and chunk[:2] == b"\x1f\x8b":
+            inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        yield inflate.decompress(chunk) if inflate else chunk
+    if inflate:
+        yield inflate.flush()
+
+
+def iter_sitemap(sess, url, timeout=25, log=lambda *a, **k: None, _depth=0, _seen=None):
+    """
+    Yield (loc, priority) for every <url> in a sitemap, following nested
+    <sitemapindex> entries. Parsed incrementally: each element is dropped as
+    soon as it has been read, so a 50k-entry sitemap never sits in memory.
+    """
+    _seen = _seen if _seen is not None else set()
+    if url in _seen or _depth > 4:
+        return
+    _seen.add(url)
+
+    try:
+        r = sess.get(url, timeout=timeout, stream=True)
+    except Exception as e:
+        log(f"sitemap error {url}: {e}")
+        return
+    if r.status_code >= 400:
+        log(f"skip sitemap {url} [{r.status_code}]")
+        r.close()
+        return
+
+    parser = ET.XMLPullParser(events=("start", "end"))
+    nested = []
+    loc, prio = None, None
+    depth = 0  # elements open above the current one
+    try:
+        for chunk in _iter_xml_chunks(r):
+            parser.feed(chunk)
+            for ev, el in parser.read_events():
+                if ev == "start":
+                    depth += 1
+                    continue
+                depth -= 1
+                name = _local(el.tag)
+                if name in ("loc", "priority") and depth != 2:
+                    # only <url>/<sitemap>'s own children; <image:loc> etc. aren't the page
+                    continue
+                if name == "loc":
+                    loc = (el.text or "").strip()
+                elif name == "priority":
+                    try:
+                        prio = float((el.text or "").strip())
+                    except ValueError:
+                        prio = None
+                elif name == "url":
+                    if loc:
+                        yield loc, prio
+                    loc, prio = None, None
+                    el.clear()
+                elif name == "sitemap":
+                    if loc:
+                        nested.append(loc)
+                    loc, prio = None, None
+                    el.clear()
+    except ET.ParseError as e:
+        log(f"sitemap parse error {url}: {e}")
+    finally:
+        r.close()
+
+    for sm in nested:
+        yield from iter_sitemap(sess, sm, timeout, log, _depth + 1, _seen)
+
+
+def sitemap_seeds(sess, origin, sitemaps=None, limit=0, timeout=25,
+                  log=lambda *a, **k: None):
+    """
+    Yield (loc, priority) from the given sitemap urls, or <origin>/sitemap.xml
+    if robots.txt listed none. Stops after `limit` entries (0 = no limit).
+    """
+    if not sitemaps:
+        p = urllib.parse.urlsplit(origin)
+        sitemaps = [urllib.parse.urlunsplit((p.scheme, p.netloc, "/sitemap.xml", "", ""))]
+
+    n = 0
+    seen = set()
+    for sm in sitemaps:
+        for loc, prio in iter_sitemap(sess, sm, timeout, log, _seen=seen):
+            yield loc, prio
+            n += 1
+            if limit and n >= limit:
+                return
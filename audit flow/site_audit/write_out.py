@@ -7,50 +7,77 @@ def _sheet_name_from_url(url: str) -> str:
     s = re.sub(r"[^A-Za-z0-9_]", "_", url.split("://",1)[-1])
     return s[:31] or "home"
 
-def write_csvs(all_pages: dict, out_dir: Path | str):
+def _num(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return float("nan")
+
+def _page_frame(url, page):
+    """
+    (rows DataFrame, summary row) for one page. page is a model.PageRecord
+    (metrics read once from the page) or a plain list of row dicts (metrics
+    averaged over the rows, as before).
+    """
+    if hasattr(page, "rows"):
+        df = pd.DataFrame(page.rows())
+        counts = page.severity_counts()
+        crit, med, low = (counts.get(k, 0) for k in ("critical", "medium", "low"))
+        lcp, cls, tti = _num(page.lcp), _num(page.cls), _num(page.tti)
+    else:
+        df = pd.DataFrame(page)
+        sev = df.get("Severity")
+        crit, med, low = (int((sev == k).sum()) if sev is not None else 0
+                          for k in ("critical", "medium", "low"))
+        lcp, cls, tti = (pd.to_numeric(df.get(k), errors="coerce").mean()
+                         for k in ("LCP", "CLS", "TTI"))
+    return df, {
+        "Page": url,
+        "Critical": crit,
+        "Medium":  med,
+        "Low":     low,
+        "Avg LCP": lcp,
+        "Avg CLS": cls,
+        "Avg TTI": tti,
+    }
+
+def page_frames(all_pages: dict):
+    """
+    ({page url: rows DataFrame}, summary rows) for every page, built once
+    and handed to write_csvs and write_xlsx.
+    """
+    frames, summary_rows = {}, []
+    for url, page in all_pages.items():
+        frames[url], summary = _page_frame(url, page)
+        summary_rows.append(summary)
+    return frames, summary_rows
+
+def write_csvs(all_pages: dict, out_dir: Path | str, frames=None):
     out_dir = Path(out_dir)
     pages_dir = out_dir / "pages"
     pages_dir.mkdir(parents=True, exist_ok=True)
 
-    summary_rows = []
-    for url, rows in all_pages.items():
-        df = pd.DataFrame(rows)
+    frames, summary_rows = frames or page_frames(all_pages)
+    for url, df in frames.items():
         df.to_csv(pages_dir / f"{_sheet_name_from_url(url)}.csv", index=False)
-
-        lcp = pd.to_numeric(df.get("LCP"), errors="coerce").mean()
-        cls = pd.to_numeric(df.get("CLS"), errors="coerce").mean()
-        tti = pd.to_numeric(df.get("TTI"), errors="coerce").mean()
-        sev = df.get("Severity")
-        summary_rows.append({
-            "Page": url,
-            "Critical": int((sev == "critical").sum()) if sev is not None else 0,
-            "Medium":  int((sev == "medium").sum()) if sev is not None else 0,
-            "Low":     int((sev == "low").sum()) if sev is not None else 0,
-            "Avg LCP": lcp,
-            "Avg CLS": cls,
-            "Avg TTI": tti,
-        })
     pd.DataFrame(summary_rows).to_csv(out_dir / "summary.csv", index=False)
 
-def write_xlsx(all_pages: dict, xlsx_path: Path | str):
+def write_savings_index(savings_rows: list, out_dir: Path | str):
+    """Cross-page ranked savings (SavingsIndex.rows()) -> savings_index.csv"""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(savings_rows).to_csv(out_dir / "savings_index.csv", index=False)
+
+def write_xlsx(all_pages: dict, xlsx_path: Path | str, savings_rows: list | None = None,
+               frames=None):
     xlsx_path = Path(xlsx_path)
     xlsx_path.parent.mkdir(parents=True, exist_ok=True)
+    frames, srows = frames or page_frames(all_pages)
     with pd.ExcelWriter(xlsx_path, engine="openpyxl") as xl:
         # one sheet per page
-        for url, rows in all_pages.items():
-            pd.DataFrame(rows).to_excel(xl, index=False, sheet_name=_sheet_name_from_url(url))
+        for url, df in frames.items():
+            df.to_excel(xl, index=False, sheet_name=_sheet_name_from_url(url))
         # summary
-        srows = []
-        for url, rows in all_pages.items():
-            df = pd.DataFrame(rows)
-            sev = df.get("Severity")
-            srows.append({
-                "Page": url,
-                "Critical": int((sev == "critical").sum()) if sev is not None else 0,
-                "Medium":  int((sev == "medium").sum()) if sev is not None else 0,
-                "Low":     int((sev == "low").sum()) if sev is not None else 0,
-                "Avg LCP": pd.to_numeric(df.get("LCP"), errors="coerce").mean(),
-                "Avg CLS": pd.to_numeric(df.get("CLS"), errors="coerce").mean(),
-                "Avg TTI": pd.to_numeric(df.get("TTI"), errors="coerce").mean(),
-            })
         pd.DataFrame(srows).to_excel(xl, index=False, sheet_name="summary")
+        if savings_rows:
+            pd.DataFrame(savings_rows).to_excel(xl, index=False, sheet_name="savings")
@@ -0,0 +1,23 @@
+from site_audit.cluster import url_template, cluster_urls, pick_samples
+
+
+def test_url_template_placeholders():
+    assert url_template("https://X.com/product/123?size=9&color=red") == \
+        "https://x.com/product/{id}?color&size"
+    assert url_template("https://x.com/p/blue-shoe-48213") == "https://x.com/p/{slug}"
+    assert url_template("https://x.com/docs/getting-started/") == \
+        "https://x.com/docs/getting-started/"
+
+
+def test_cluster_and_samples():
+    urls = ["https://x.com/"] + [f"https://x.com/product/{i}" for i in range(5)] + \
+           [f"https://x.com/blog/{w}" for w in ("a", "b", "c", "d", "e")]
+    clusters = cluster_urls(urls)
+    assert list(clusters) == ["https://x.com/", "https://x.com/product/{id}",
+                              "https://x.com/blog/{slug}"]
+
+    samples, rep = pick_samples(clusters, 2)
+    assert samples == ["https://x.com/", "https://x.com/product/0", "https://x.com/product/1",
+                       "https://x.com/blog/a", "https://x.com/blog/b"]
+    assert rep["https://x.com/product/4"] == "https://x.com/product/0"
+    assert "https://x.com/" not in rep
@@ -0,0 +1,247 @@
+import gzip
+import json
+import threading
+import requests
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from site_audit.crawl import crawl_same_origin
+from site_audit.crawl_cache import CrawlCache
+from site_audit.frontier import Frontier
+from site_audit.politeness import AdaptiveThrottle
+from site_audit.sitemap import iter_sitemap
+
+# tiny in-memory site: / -> a, b ; a -> c, d ; b -> e ; plus junk links
+SITE = {
+    "/": '<a href="/a">a</a> <a href="/b#top">b</a> <a href="mailto:x@y">m</a>'
+         '<a href="https://elsewhere.example/">x</a>',
+    "/a": '<a href="/c">c</a><a href="d">d</a><a href="/">home</a>',
+    "/b": '<a href="/e">e</a><a href="/missing">404</a>',
+    "/c": "c", "/d": "d", "/e": "e",
+    "/deep": "only reachable through the sitemap",
+}
+
+# non-HTML resources: path -> (content type, body)
+FILES = {
+    "/robots.txt": ("text/plain", b"User-agent: *\nDisallow: /b\nSitemap: {base}/sm-index.xml\n"),
+    "/sm-index.xml": ("application/xml", b'<?xml version="1.0"?>'
+                      b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                      b"<sitemap><loc>{base}/sm-1.xml.gz</loc></sitemap></sitemapindex>"),
+    "/sm-1.xml.gz": ("application/x-gzip", gzip.compress(
+                     b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                     b"<url><loc>{base}/deep</loc><priority>0.8</priority></url>"
+                     b"<url><loc>https://elsewhere.example/x</loc></url></urlset>")),
+    "/sm-images.xml": ("application/xml", b'<?xml version="1.0"?>'
+                       b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+                       b'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1" '
+                       b'xmlns:xhtml="http://www.w3.org/1999/xhtml">'
+                       b"<url><loc>{base}/product</loc>"
+                       b'<xhtml:link rel="alternate" hreflang="de" href="{base}/de/product"/>'
+                       b"<image:image><image:loc>https://cdn.x.com/1.jpg</image:loc></image:image>"
+                       b"<priority>0.5</priority></url></urlset>"),
+}
+
+
+THROTTLE_ONCE = set()  # paths that answer 429 the first time they are asked for
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path in THROTTLE_ONCE:
+            THROTTLE_ONCE.discard(self.path)
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        if self.path in FILES:
+            ctype, data = FILES[self.path]
+            base = f"http://127.0.0.1:{self.server.server_address[1]}".encode()
+            if self.path.endswith(".gz"):
+                data = gzip.compress(gzip.decompress(data).replace(b"{base}", base))
+            else:
+                data = data.replace(b"{base}", base)
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        body = SITE.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = body.encode("utf-8")
+        etag = '"%x"' % (hash(body) & 0xffffffff)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *a):
+        pass
+
+
+def _serve():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}"
+
+
+def test_concurrent_crawl_matches_sequential_bfs():
+    srv, base = _serve()
+    try:
+        seq = crawl_same_origin(base + "/", max_pages=10, timeout=5, concurrency=1)
+        par = crawl_same_origin(base + "/", max_pages=10, timeout=5, concurrency=4)
+        capped = crawl_same_origin(base + "/", max_pages=3, timeout=5, concurrency=4)
+        soup = crawl_same_origin(base + "/", max_pages=10, timeout=5, parser="bs4")
+        tiny = crawl_same_origin(base + "/", max_pages=10, timeout=5, max_bytes=20)
+    finally:
+        srv.shutdown()
+
+    want = [base + p for p in ("/", "/a", "/b", "/c", "/d", "/e")]
+    assert seq == want
+    assert par == want
+    assert capped == want[:3]
+    assert soup == want
+    # a 20 byte cap only ever sees the first link on each page
+    assert tiny == [base + "/", base + "/a", base + "/c"]
+
+
+def test_crawl_cache_revalidates_with_etag(tmp_path):
+    srv, base = _serve()
+    path = tmp_path / "crawl_cache.json"
+    try:
+        first = CrawlCache(path)
+        a = crawl_same_origin(base + "/", max_pages=10, timeout=5, cache=first)
+        second = CrawlCache(path)
+        b = crawl_same_origin(base + "/", max_pages=10, timeout=5, cache=second)
+    finally:
+        srv.shutdown()
+
+    assert a == b
+    assert (first.hits, first.misses) == (0, 6)
+    assert (second.hits, second.misses) == (6, 0)
+    assert second.get(base + "/a")["hash"]
+
+
+def test_sitemap_seeding_and_robots():
+    srv, base = _serve()
+    try:
+        got = crawl_same_origin(base + "/", max_pages=10, timeout=5,
+                                sitemaps=True, obey_robots=True)
+    finally:
+        srv.shutdown()
+
+    # /deep comes straight after start; /b (and so /e) is disallowed
+    assert got == [base + p for p in ("/", "/deep", "/a", "/c", "/d")]
+
+
+def test_image_sitemap_keeps_page_loc():
+    srv, base = _serve()
+    try:
+        with requests.Session() as sess:
+            got = list(iter_sitemap(sess, base + "/sm-images.xml", timeout=5))
+    finally:
+        srv.shutdown()
+
+    assert got == [(base + "/product", 0.5)]
+
+
+def test_checkpoints_only_append_what_changed(tmp_path):
+    state = tmp_path / "frontier.json"
+    f = Frontier()
+    for u in ("https://x.com/", "https://x.com/a"):
+        f.discover(u)
+        f.push(u)
+    f.save(state)
+    log = tmp_path / "frontier.json.seen.log"
+    first = log.read_bytes()
+    f.discover("https://x.com/b")
+    f.save(state)
+    assert log.read_bytes() == first + b"https://x.com/b\n"
+    assert "seen" not in json.loads(state.read_text(encoding="utf-8"))
+
+    with open(log, "ab") as fh:
+        fh.write(b"https://x.com/after-checkpoint\n")  # crashed before the state was saved
+    back = Frontier.load(state)
+    assert back.seen == {"https://x.com/", "https://x.com/a", "https://x.com/b"}
+    assert log.read_bytes() == first + b"https://x.com/b\n"
+
+    cache_path = tmp_path / "crawl_cache.json"
+    cache_path.write_text(json.dumps({"https://x.com/": {"etag": "old"}}), encoding="utf-8")
+    cache = CrawlCache(cache_path)  # the old one-object format still loads
+    assert cache.get("https://x.com/")["etag"] == "old"
+    cache.save()
+    cache.put("https://x.com/a", {"etag": "a"})
+    cache.save()
+    assert len(cache_path.read_text(encoding="utf-8").splitlines()) == 2
+    cache.put("https://x.com/a", {"etag": "a2"})
+    cache.save()  # appended, not rewritten
+    assert len(cache_path.read_text(encoding="utf-8").splitlines()) == 3
+    assert CrawlCache(cache_path).get("https://x.com/a")["etag"] == "a2"
+
+
+def test_max_depth_and_resume(tmp_path):
+    srv, base = _serve()
+    state = tmp_path / "frontier.json"
+    try:
+        shallow = crawl_same_origin(base + "/", max_pages=10, timeout=5, max_depth=1)
+        first = crawl_same_origin(base + "/", max_pages=3, timeout=5, concurrency=3,
+                                  state_path=state)
+        rest = crawl_same_origin(base + "/", max_pages=10, timeout=5,
+                                 state_path=state, resume=True)
+        weighted = crawl_same_origin(base + "/", max_pages=10, timeout=5,
+                                     prefix_weights={"/e": 2})
+    finally:
+        srv.shutdown()
+
+    want = [base + p for p in ("/", "/a", "/b", "/c", "/d", "/e")]
+    assert shallow == want[:3]
+    assert first == want[:3]
+    assert rest == want
+    # /e is found on /b (depth 2) but weighted ahead of the other depth-2 pages
+    assert weighted == [base + p for p in ("/", "/a", "/b", "/e", "/c", "/d")]
+
+
+def test_compact_seen_set_and_spilled_frontier(tmp_path):
+    srv, base = _serve()
+    state = tmp_path / "frontier.json"
+    try:
+        hashed = crawl_same_origin(base + "/", max_pages=10, timeout=5, seen_set="hashed",
+                                   frontier_mem_limit=2, state_path=state)
+        bloom = crawl_same_origin(base + "/", max_pages=10, timeout=5, seen_set="bloom")
+    finally:
+        srv.shutdown()
+
+    want = [base + p for p in ("/", "/a", "/b", "/c", "/d", "/e")]
+    assert hashed == want
+    assert bloom == want
+
+
+def test_throttled_page_is_retried_not_dropped():
+    srv, base = _serve()
+    THROTTLE_ONCE.update({"/a", "/c"})
+    try:
+        got = crawl_same_origin(base + "/", max_pages=10, timeout=5, concurrency=2)
+    finally:
+        srv.shutdown()
+        THROTTLE_ONCE.clear()
+
+    assert sorted(got) == sorted(base + p for p in ("/", "/a", "/b", "/c", "/d", "/e"))
+
+
+def test_throttle_holds_growth_while_errors_are_recent():
+    t = AdaptiveThrottle(max_concurrency=8, start=4)
+    for _ in range(3):
+        t.on_error()
+    cut = t.window
+    assert t.error_rate > t.error_hold
+    t.on_success(0.1)
+    assert t.window == cut  # one good answer between failures doesn't grow it
+    for _ in range(10):
+        t.on_success(0.1)
+    assert t.error_rate <= t.error_hold and t.window > cut
@@ -0,0 +1,26 @@
+import shutil
+from pathlib import Path
+from site_audit.grade_pool import grade_reports, MIN_POOL_FILES
+
+ROOT = Path(__file__).resolve().parents[1]
+LHR = ROOT / "tests" / "data" / "sample_lhr.json"
+RULES = ROOT / "config" / "rules.yaml"
+
+
+def test_pool_matches_serial_in_order(tmp_path):
+    paths = []
+    for i in range(MIN_POOL_FILES):
+        p = tmp_path / f"p{i:02d}.report.json"
+        shutil.copyfile(LHR, p)
+        paths.append(p)
+    paths.insert(3, tmp_path / "missing.report.json")
+
+    serial = list(grade_reports(paths, RULES, workers=1))
+    pooled = list(grade_reports(paths, RULES, workers=2))
+    assert [p for p, _, _ in pooled] == paths
+    assert pooled == serial
+    assert serial[3][1:] == ([], {}) and serial[0][1]
+    assert all("Severity" in r for r in serial[0][1])
+
+    failing = list(grade_reports(paths[:2], RULES, only_failing=True))
+    assert all(r["Severity"] in ("medium", "critical") for r in failing[0][1])
@@ -0,0 +1,39 @@
+import time
+from site_audit.lh_cache import ResultCache, cache_key
+
+
+def _report(path, body):
+    path.write_text(body, encoding="utf-8")
+    return path
+
+
+def test_hit_miss_ttl_and_lru_eviction(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    cache = ResultCache(tmp_path / "lh_cache", ttl_s=3600, max_bytes=0)
+
+    k1 = cache_key("https://x.com/", "mobile", "12.0.0", {"also_html": False}, "aaa")
+    k2 = cache_key("https://x.com/", "mobile", "12.0.0", {"also_html": False}, "bbb")
+    assert k1 != k2  # page content changed -> new key
+
+    assert not cache.get(k1, raw / "x.report.json")
+    cache.put(k1, "https://x.com/", _report(raw / "x.report.json", '{"v": 1}'))
+    cache.save()
+
+    again = ResultCache(tmp_path / "lh_cache", ttl_s=3600)
+    (raw / "x.report.json").unlink()
+    assert again.get(k1, raw / "x.report.json")
+    assert (raw / "x.report.json").read_text() == '{"v": 1}'
+    assert (again.hits, again.misses) == (1, 0)
+
+    # expired entries are misses
+    again.index[k1]["created"] = time.time() - 7200
+    assert not again.get(k1, raw / "y.report.json")
+
+    # size cap keeps the most recently used entry
+    small = ResultCache(tmp_path / "lh_small", ttl_s=0, max_bytes=15)
+    small.put("old", "u1", _report(raw / "a.report.json", "x" * 10))
+    small.put("new", "u2", _report(raw / "b.report.json", "y" * 10))
+    small.index["old"]["used"] -= 10
+    small.save()
+    assert list(small.index) == ["new"]
@@ -0,0 +1,90 @@
+import json
+import time
+from pathlib import Path
+
+from site_audit import lighthouse_runner as lr
+from site_audit.lhr_merge import merge_lhrs, is_stable
+
+
+def _lhr(lcp, cls, contrast_score=1, perf=0.5):
+    return {
+        "finalUrl": "https://x.com/",
+        "categories": {"performance": {"score": perf}},
+        "audits": {
+            "largest-contentful-paint": {"title": "LCP", "score": 0.5, "numericValue": lcp},
+            "cumulative-layout-shift": {"title": "CLS", "score": 0.9, "numericValue": cls},
+            "color-contrast": {"title": "Contrast", "score": contrast_score,
+                               "details": {"items": [{"node": {"snippet": "<p>"}}]}},
+        },
+    }
+
+
+def test_merge_takes_medians_and_union_of_failures():
+    runs = [_lhr(3000, 0.1, perf=0.4), _lhr(5200, 0.3, 0, perf=0.6), _lhr(4000, 0.2, perf=0.5)]
+    m = merge_lhrs(runs)
+    assert m["audits"]["largest-contentful-paint"]["numericValue"] == 4000
+    assert m["audits"]["cumulative-layout-shift"]["numericValue"] == 0.2
+    assert m["audits"]["color-contrast"]["score"] == 0   # failed in one run
+    assert m["categories"]["performance"]["score"] == 0.5
+    assert m["siteAuditRuns"] == 3
+
+
+def test_is_stable():
+    assert not is_stable([_lhr(3000, 0.1)])
+    assert is_stable([_lhr(3000, 0.1), _lhr(3050, 0.1), _lhr(2990, 0.1)], 0.05)
+    assert not is_stable([_lhr(3000, 0.1), _lhr(4500, 0.1)], 0.05)
+
+
+def test_repeated_runs_stop_early_when_stable(monkeypatch, tmp_path):
+    lcps = {"https://x.com/steady": iter([3000, 3010, 2990, 3000, 3000]),
+            "https://x.com/noisy": iter([2000, 4000, 3000, 5000, 2500])}
+
+    def fake_run(url, out_dir, tag=None, **kw):
+        jf = lr.report_path(url, out_dir, tag)
+        jf.write_text(json.dumps(_lhr(next(lcps[url]), 0.1)), encoding="utf-8")
+        return lr.LighthouseResult(url, jf, duration=1.0)
+
+    monkeypatch.setattr(lr, "_lighthouse_cmd", lambda: ["lighthouse"])
+    monkeypatch.setattr(lr, "run_lighthouse", fake_run)
+
+    out = lr.run_lighthouse_repeated(list(lcps), tmp_path, runs=5, tolerance=0.05, workers=2)
+    assert [r.attempts for r in out] == [3, 5]
+    merged = json.loads(Path(out[1].path).read_text(encoding="utf-8"))
+    assert merged["audits"]["largest-contentful-paint"]["numericValue"] == 3000
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(r.path.name for r in out)
+
+
+def test_repeated_runs_share_one_time_budget(monkeypatch, tmp_path):
+    lcps = iter([2000, 4000, 3000, 5000, 2500, 4500])
+
+    def fake_run(url, out_dir, tag=None, deadline=None, **kw):
+        # like run_lighthouse: an attempt never runs past the deadline
+        if deadline is not None and deadline - time.monotonic() < 0.4:
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            return lr.LighthouseResult(url, lr.report_path(url, out_dir, tag), "timeout")
+        time.sleep(0.4)
+        jf = lr.report_path(url, out_dir, tag)
+        jf.write_text(json.dumps(_lhr(next(lcps), 0.1)), encoding="utf-8")
+        return lr.LighthouseResult(url, jf, duration=0.4)
+
+    monkeypatch.setattr(lr, "_lighthouse_cmd", lambda: ["lighthouse"])
+    monkeypatch.setattr(lr, "run_lighthouse", fake_run)
+
+    t0 = time.monotonic()
+    out = lr.run_lighthouse_repeated(["https://x.com/noisy"], tmp_path, runs=6,
+                                     tolerance=0.05, workers=3, time_budget=1.0)
+    assert time.monotonic() - t0 < 1.3
+    assert out[0].ok and out[0].attempts < 6
+
+
+def test_repeated_runs_that_all_fail_leave_no_report(monkeypatch, tmp_path):
+    monkeypatch.setattr(lr, "_lighthouse_cmd", lambda: ["lighthouse"])
+    monkeypatch.setattr(lr, "run_lighthouse",
+                        lambda url, out_dir, tag=None, **kw:
+                        lr.LighthouseResult(url, lr.report_path(url, out_dir, tag), "failed"))
+    old = lr.report_path("https://x.com/", tmp_path)
+    old.write_text(json.dumps(_lhr(3000, 0.1)), encoding="utf-8")  # merged by an earlier run
+
+    out = lr.run_lighthouse_repeated(["https://x.com/"], tmp_path, runs=3)
+    assert out[0].status == "failed"
+    assert not old.exists()
@@ -0,0 +1,35 @@
+import json
+from pathlib import Path
+from site_audit.lhr_store import slim_lhr, save_lhr, load_lhr, store_report, html_path, find_reports
+from site_audit.parse import rows_from_lhr
+
+LHR = Path(__file__).resolve().parent / "data" / "sample_lhr.json"
+
+
+def test_slim_gz_round_trip_keeps_rows(tmp_path):
+    lhr = json.loads(LHR.read_text(encoding="utf-8"))
+    lhr["fullPageScreenshot"] = {"screenshot": {"data": "x" * 1000}}
+    lhr["audits"]["screenshot-thumbnails"] = {"id": "screenshot-thumbnails", "score": None,
+                                              "details": {"type": "filmstrip", "items": [1, 2]}}
+    want = rows_from_lhr(json.loads(json.dumps(lhr)))
+
+    src = tmp_path / "x.report.json"
+    src.write_text(json.dumps(lhr), encoding="utf-8")
+    (tmp_path / "x.report.html").write_text("<html>", encoding="utf-8")
+    dest = store_report(src, "gz", slim=True)
+
+    assert dest.name == "x.report.json.gz" and not src.exists()
+    assert dest.read_bytes()[:2] == b"\x1f\x8b"
+    assert html_path(dest) == tmp_path / "x.report.html"
+    assert find_reports(tmp_path) == [dest]
+
+    back = load_lhr(dest)
+    assert "fullPageScreenshot" not in back
+    assert "details" not in back["audits"]["screenshot-thumbnails"]
+    assert rows_from_lhr(back) == want
+
+
+def test_load_plain_json(tmp_path):
+    p = save_lhr({"a": 1}, tmp_path / "y.report.json")
+    assert load_lhr(p) == {"a": 1}
+    assert store_report(p) == p  # json, not slim: left alone
@@ -0,0 +1,141 @@
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from site_audit import lighthouse_runner as lr
+
+
+def test_pool_keeps_input_order_and_isolates_failures(monkeypatch, tmp_path):
+    active, peak, profiles = [0], [0], set()
+    lock = threading.Lock()
+
+    def fake_run(url, out_dir, user_data_dir=None, port=None, **kw):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            profiles.add(user_data_dir)
+        time.sleep(0.05 if url.endswith("1") else 0.01)
+        with lock:
+            active[0] -= 1
+        if url.endswith("crash"):
+            raise RuntimeError("chrome died")
+        return lr.LighthouseResult(url, Path(out_dir) / (url.rsplit("/", 1)[-1] + ".report.json"))
+
+    monkeypatch.setattr(lr, "_lighthouse_cmd", lambda: ["lighthouse"])
+    monkeypatch.setattr(lr, "run_lighthouse", fake_run)
+
+    urls = [f"https://x.com/p{i}" for i in range(1, 6)] + ["https://x.com/crash"]
+    done = []
+    out = lr.run_lighthouse_many(urls, tmp_path, workers=3,
+                                 progress=lambda n, total, r: done.append((n, total, r.ok)))
+
+    assert [r.path.name for r in out[:5]] == [f"p{i}.report.json" for i in range(1, 6)]
+    assert out[5].status == "failed"
+    assert out[5].path == tmp_path / (lr._slug(urls[5]) + ".report.json")
+    assert peak[0] <= 3 and len(profiles) <= 3
+    assert [n for n, _, _ in done] == list(range(1, 7)) and done[0][1] == 6
+    assert sum(not ok for _, _, ok in done) == 1
+
+
+def test_skipped_page_loses_its_stale_report(monkeypatch, tmp_path):
+    monkeypatch.setattr(lr, "_lighthouse_cmd", lambda: ["lighthouse"])
+    stale = lr.report_path("https://x.com/", tmp_path)
+    stale.write_text("{}", encoding="utf-8")  # from an earlier run into the same --out
+
+    out = lr.run_lighthouse_many(["https://x.com/"], tmp_path, time_budget=1e-9)
+    assert out[0].status == "skipped"
+    assert not stale.exists()
+
+
+def test_persistent_chrome_is_reused_and_recycled(monkeypatch, tmp_path):
+    starts, ports_used = [], []
+
+    class FakeChrome:
+        def __init__(self, profile, chrome_path=None, log=None):
+            self.port = None
+
+        def alive(self):
+            return self.port is not None
+
+        def start(self):
+            starts.append(1)
+            self.port = 9000 + len(starts)
+            return self.port
+
+        def stop(self):
+            self.port = None
+
+    def fake_run(url, out_dir, port=None, **kw):
+        ports_used.append(port)
+        return lr.LighthouseResult(url, Path(out_dir) / "x.report.json")
+
+    monkeypatch.setattr(lr, "_lighthouse_cmd", lambda: ["lighthouse"])
+    monkeypatch.setattr(lr, "ChromeSession", FakeChrome)
+    monkeypatch.setattr(lr, "run_lighthouse", fake_run)
+
+    urls = [f"https://x.com/p{i}" for i in range(5)]
+    lr.run_lighthouse_many(urls, tmp_path, workers=1, persistent_chrome=True, recycle_every=2)
+
+    assert len(starts) == 3
+    assert ports_used == [9001, 9001, 9002, 9002, 9003]
+
+
+def test_hung_run_is_killed_and_retried(monkeypatch, tmp_path):
+    # a "lighthouse" that hangs on the first attempt and writes a report on the second
+    marker = tmp_path / "attempted"
+    script = (
+        "import sys, time, pathlib\n"
+        f"m = pathlib.Path({str(marker)!r})\n"
+        "if not m.exists():\n"
+        "    m.write_text('1'); time.sleep(60)\n"
+        "out = sys.argv[sys.argv.index('--output-path') + 1]\n"
+        "pathlib.Path(out + '.report.json').write_text('{}')\n"
+    )
+    monkeypatch.setattr(lr, "_lighthouse_cmd", lambda: [sys.executable, "-c", script])
+
+    t0 = time.monotonic()
+    res = lr.run_lighthouse("https://x.com/", tmp_path, timeout=1, retries=1, backoff_s=0)
+    assert res.ok and res.attempts == 2
+    assert res.path.exists()
+    assert time.monotonic() - t0 < 20
+
+    budget = lr.run_lighthouse("https://x.com/a", tmp_path, timeout=30, retries=3,
+                               backoff_s=0, deadline=time.monotonic() - 1)
+    assert budget.status == "skipped"
+
+
+def _alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            return f.read().rsplit(b")", 1)[1].split()[0] != b"Z"
+    except OSError:
+        return False
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_timeout_kills_detached_grandchild(monkeypatch, tmp_path):
+    # like chrome-launcher: "lighthouse" starts a "Chrome" in its own session, then hangs
+    pid_file = tmp_path / "chrome.pid"
+    script = (
+        "import subprocess, sys, time, pathlib\n"
+        "p = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'],"
+        " start_new_session=True)\n"
+        f"pathlib.Path({str(pid_file)!r}).write_text(str(p.pid))\n"
+        "time.sleep(60)\n"
+    )
+    monkeypatch.setattr(lr, "_lighthouse_cmd", lambda: [sys.executable, "-c", script])
+
+    t0 = time.monotonic()
+    res = lr.run_lighthouse("https://x.com/", tmp_path, timeout=2)
+    assert res.status == "timeout"
+    assert time.monotonic() - t0 < 20  # an orphan holding stderr would stall communicate()
+    chrome = int(pid_file.read_text())
+    for _ in range(50):
+        if not _alive(chrome):
+            break
+        time.sleep(0.05)
+    assert not _alive(chrome)
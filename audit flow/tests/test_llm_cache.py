@@ -0,0 +1,48 @@
+import json, time
+from site_audit.llm_cache import LLMCache, answer_key, legacy_key, main
+
+ROW = {"Page URL": "https://x.com/a", "Rule ID": "image-alt", "Title": "Images need alt",
+       "Example": "<img src=a.png>", "Severity": "medium"}
+
+
+def test_scopes_model_version_and_legacy_import(tmp_path):
+    jsonl = tmp_path / "llm_cache.jsonl"
+    jsonl.write_text(
+        json.dumps({"k": legacy_key(ROW), "v": {"root_cause": "old", "recommendation": "x"}}) + "\n"
+        + json.dumps({"k": legacy_key(ROW), "v": {"root_cause": "newer", "recommendation": "y"}}) + "\n",
+        encoding="utf-8")
+    cache = LLMCache(tmp_path / "c.sqlite", legacy_jsonl=jsonl)
+    assert len(cache) == 1
+    assert cache.lookup(ROW, "page", "m", 1)["root_cause"] == "newer"  # legacy entry, re-filed
+    assert cache.get(answer_key(ROW, "page", "m", 1)) is not None
+
+    other_page = dict(ROW, **{"Page URL": "https://x.com/b"})
+    assert answer_key(ROW, "content", "m", 1) == answer_key(other_page, "content", "m", 1)
+    assert answer_key(ROW, "page", "m", 1) != answer_key(other_page, "page", "m", 1)
+    assert answer_key(ROW, "content", "m", 1) != answer_key(ROW, "content", "m2", 1)
+    assert answer_key(ROW, "content", "m", 1) != answer_key(ROW, "content", "m", 2)
+    cache.close()
+
+
+def test_ttl_and_lru(tmp_path):
+    cache = LLMCache(tmp_path / "c.sqlite", ttl_s=60, max_entries=2, legacy_jsonl=None)
+    for k in ("a", "b", "c"):
+        cache.put(k, {"root_cause": k, "recommendation": k})
+        time.sleep(0.01)
+    cache.get("a")  # a is now the most recently used
+    cache.evict()
+    assert cache.get("b") is None and cache.get("a") and cache.get("c")
+
+    cache._db.execute("UPDATE answers SET created = created - 120 WHERE k = 'a'")
+    assert cache.get("a") is None
+    cache.close()
+
+
+def test_compact_command(tmp_path, capsys):
+    jsonl = tmp_path / "old.jsonl"
+    jsonl.write_text("\n".join(json.dumps({"k": k, "v": {"root_cause": k}}) for k in "aab") + "\n",
+                     encoding="utf-8")
+    db = tmp_path / "c.sqlite"
+    assert main(["compact", "--db", str(db), "--jsonl", str(jsonl), "--remove-jsonl"]) == 0
+    assert "3 line(s)" in capsys.readouterr().out and not jsonl.exists()
+    assert len(LLMCache(db, legacy_jsonl=None)) == 2
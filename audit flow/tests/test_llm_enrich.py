@@ -0,0 +1,145 @@
+import json, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from site_audit import llm_enrich
+from site_audit.llm_cache import LLMCache
+from site_audit.politeness import TokenBucket
+
+
+class _FakeLLM(BaseHTTPRequestHandler):
+    active = 0
+    peak = 0
+    calls = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.calls += 1
+            cls.peak = max(cls.peak, cls.active)
+        time.sleep(0.1)
+        rule = body["messages"][1]["content"].split("rule_id: ")[1].split("\n")[0]
+        out = json.dumps({"choices": [{"message": {"content": json.dumps(
+            {"root_cause": f"because {rule}", "recommendation": f"fix {rule}"})}}]}).encode()
+        with cls.lock:
+            cls.active -= 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *a):
+        pass
+
+
+def test_concurrent_in_order_deduped_and_cached(tmp_path):
+    cache = LLMCache(tmp_path / "llm_cache.sqlite", legacy_jsonl=None)
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _FakeLLM)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{srv.server_address[1]}/v1"
+    try:
+        rows = [{"Page URL": "https://x.com/", "Rule ID": f"rule-{i}", "Severity": "medium"}
+                for i in range(6)]
+        rows.append(dict(rows[0]))  # same finding twice -> one call
+        out = llm_enrich.enrich_rows_llm(rows, base_url=base, model="m", max_in_flight=3, rps=100,
+                                         cache=cache)
+        assert out is rows
+        assert [r["Recommendation"] for r in out] == [f"fix rule-{i}" for i in range(6)] + ["fix rule-0"]
+        assert _FakeLLM.calls == 6 and _FakeLLM.peak == 3
+
+        again = [dict(r) for r in rows]
+        for r in again:
+            r.pop("Recommendation")
+        llm_enrich.enrich_rows_llm(again, base_url=base, model="m", max_in_flight=3, cache=cache)
+        assert _FakeLLM.calls == 6  # all from the cache
+        assert cache.hits == 7
+        assert again[3]["Root Cause"] == "because rule-3"
+    finally:
+        srv.shutdown()
+
+
+class _FakeBatchLLM(_FakeLLM):
+    requests = []
+    batch_system = []  # per request: does the system message ask for the answers array?
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        rules = [part.split("\n")[0] for part in body["messages"][1]["content"].split("rule_id: ")[1:]]
+        type(self).requests.append(rules)
+        type(self).batch_system.append('"answers"' in body["messages"][0]["content"])
+        if len(rules) == 1:
+            content = {"root_cause": f"because {rules[0]}", "recommendation": f"fix {rules[0]}"}
+        else:
+            # leaves out the "odd" findings and adds an out-of-range index
+            content = {"answers": [{"index": i, "root_cause": f"because {r}", "recommendation": f"fix {r}"}
+                                   for i, r in enumerate(rules) if "odd" not in r]
+                       + [{"index": len(rules), "root_cause": "x", "recommendation": "x"}]}
+        out = json.dumps({"choices": [{"message": {"content": json.dumps(content)}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+
+def test_batched_prompts_fall_back_per_row(tmp_path):
+    cache = LLMCache(tmp_path / "llm_cache.sqlite", legacy_jsonl=None)
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _FakeBatchLLM)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{srv.server_address[1]}/v1"
+    try:
+        names = ["a", "b-odd", "c", "d", "e"]
+        rows = [{"Page URL": "https://x.com/", "Rule ID": n, "Severity": "medium"} for n in names]
+        llm_enrich.enrich_rows_llm(rows, base_url=base, model="m", rps=100, cache=cache, batch_size=4)
+        assert [r["Recommendation"] for r in rows] == [f"fix {n}" for n in names]
+        # one batch of 4, the last finding alone, then a retry for the one the batch missed
+        assert _FakeBatchLLM.requests == [["a", "b-odd", "c", "d"], ["b-odd"], ["e"]]
+        assert _FakeBatchLLM.batch_system[:3] == [True, False, False]
+        assert len(cache) == 5
+    finally:
+        srv.shutdown()
+
+
+def test_shared_limiters_throttle_across_calls(tmp_path):
+    cache = LLMCache(tmp_path / "llm_cache.sqlite", legacy_jsonl=None)
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _FakeBatchLLM)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{srv.server_address[1]}/v1"
+    now = [0.0]
+
+    def sleep(s):
+        now[0] += s
+
+    # a tokens/minute budget that fits one call, as cli.py builds once per run
+    tokens = TokenBucket(rate=10, capacity=1000, clock=lambda: now[0], sleep=sleep)
+    try:
+        for page in ("p1", "p2"):
+            rows = [{"Page URL": f"https://x.com/{page}", "Rule ID": "r", "Severity": "medium"}]
+            llm_enrich.enrich_rows_llm(rows, base_url=base, model="m", cache=cache,
+                                       limiters=(None, tokens))
+            assert rows[0]["Recommendation"] == "fix r"
+            if page == "p1":
+                assert now[0] == 0
+        assert now[0] > 10  # the second page waited for the bucket to refill
+    finally:
+        srv.shutdown()
+
+
+def test_token_bucket_rate():
+    now = [0.0]
+
+    def sleep(s):
+        now[0] += s
+
+    b = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
+    for _ in range(6):
+        b.take()
+    assert abs(now[0] - 2.0) < 1e-9  # burst of 2, then 2/s
+
+    tpm = TokenBucket(rate=10, capacity=100, clock=lambda: now[0], sleep=sleep)
+    start = now[0]
+    tpm.take(150)  # bigger than the bucket: waits for a full one, then owes 50
+    tpm.take(10)
+    assert abs(now[0] - start - 6.0) < 1e-9
@@ -27,3 +27,37 @@ def test_parse_and_severity():
 
     md_row = [r for r in rows if r["Rule ID"] == "meta-description"][0]
     assert mapper.grade(md_row, audits) == "medium"
+
+
+def test_generic_thresholds_and_frame_path():
+    import pandas as pd
+    mapper = SeverityMapper({"defaults": "low", "rules": {
+        "total-blocking-time": {"crit": ">=600", "med": ">=200"},
+        "uses-rel-preconnect": {"crit": "<0.5", "med": "<=0.9", "on": "score"},
+        "is-on-https": {"crit": True},
+        "tap-targets": True,
+    }})
+    audits = {
+        "total-blocking-time": {"numericValue": 350, "score": 0.6},
+        "uses-rel-preconnect": {"numericValue": 10, "score": 0.3},
+        "is-on-https": {"score": 0},
+        "tap-targets": {"score": 0.5},
+        "other": {"score": 0},
+    }
+    rows = [{"Rule ID": a} for a in audits] + [{"Rule ID": "total-blocking-time"}]
+    want = ["medium", "critical", "critical", "medium", "low", "medium"]
+    assert [mapper.grade(r, audits) for r in rows] == want
+    assert mapper.grade_many(rows, audits) == want
+
+    # many pages in one table; a missing value falls back to the default
+    df = pd.DataFrame([dict(r, **{k: audits[r["Rule ID"]].get(k) for k in ("numericValue", "score")})
+                       for r in rows] + [{"Rule ID": "total-blocking-time", "numericValue": None},
+                                         {"Rule ID": "total-blocking-time", "numericValue": 900}])
+    assert list(mapper.grade_frame(df)) == want + ["low", "critical"]
+
+    full = SeverityMapper.from_yaml(str(RULES))
+    lhr = json.loads(LHR.read_text(encoding="utf-8"))
+    rows = rows_from_lhr(lhr)
+    df = pd.DataFrame([dict(r, **{k: lhr["audits"][r["Rule ID"]].get(k) for k in ("numericValue", "score")})
+                       for r in rows])
+    assert list(full.grade_frame(df)) == full.grade_many(rows, lhr["audits"])
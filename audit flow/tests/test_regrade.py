@@ -0,0 +1,57 @@
+import json, shutil
+from pathlib import Path
+import pandas as pd
+from site_audit.cli import main
+from site_audit.lighthouse_runner import _slug
+from site_audit.llm_cache import LLMCache, answer_key
+from site_audit.llm_enrich import DEF_MODEL, PROMPT_VERSION
+from site_audit.regrade import regrade
+
+ROOT = Path(__file__).resolve().parents[1]
+LHR = ROOT / "tests" / "data" / "sample_lhr.json"
+
+
+def _run_dir(tmp_path):
+    run = tmp_path / "report"
+    (run / "raw_json").mkdir(parents=True)
+    url = json.loads(LHR.read_text(encoding="utf-8"))["finalUrl"]
+    shutil.copyfile(LHR, run / "raw_json" / (_slug(url) + ".report.json"))
+    (run / "urls.txt").write_text(f"{url}\t-\taudit\nhttps://example.com/twin\t-\t={url}\n",
+                                  encoding="utf-8")
+    return run, url
+
+
+def test_regrade_uses_parsed_cache_and_new_rules(tmp_path):
+    run, url = _run_dir(tmp_path)
+    assert main(["regrade", "--from", str(run), "--enrich-mode", "template"]) == 0
+    summary = pd.read_csv(run / "summary.csv")
+    assert list(summary["Page"]) == [url, "https://example.com/twin"]
+    assert (run / "parsed_cache.json").exists() and (run / "savings_index.csv").exists()
+
+    rules = tmp_path / "rules.yaml"
+    rules.write_text("defaults: low\nrules:\n  meta-description: {crit: true}\n", encoding="utf-8")
+    logs = []
+    pages = regrade(run, rules_path=rules, enrich_mode="template", log=logs.append)
+    assert "1 cached, 0 parsed" in logs[0]
+    row = [r for r in pages[url].rows() if r["Rule ID"] == "meta-description"][0]
+    assert row["Severity"] == "critical" and row["Recommendation"]
+    assert pages["https://example.com/twin"].findings is pages[url].findings
+
+
+def test_regrade_only_reads_an_existing_llm_cache(tmp_path):
+    run, url = _run_dir(tmp_path)
+    db = tmp_path / "llm_cache.sqlite"
+    regrade(run, enrich_mode="llm", llm_cache=db, log=lambda *a: None)
+    assert not db.exists()  # nothing to read: nothing created
+
+    row = regrade(run, enrich_mode="template", log=lambda *a: None)[url].rows()[0]
+    cache = LLMCache(db, legacy_jsonl=None)
+    cache.put(answer_key(row, "page", DEF_MODEL, PROMPT_VERSION),
+              {"root_cause": "cached", "recommendation": "from the llm"})
+    cache.close()
+    before = db.read_bytes(), db.stat().st_mtime_ns
+
+    pages = regrade(run, enrich_mode="llm", llm_cache=db, log=lambda *a: None)
+    got = [r for r in pages[url].rows() if r["Rule ID"] == row["Rule ID"]][0]
+    assert got["Recommendation"] == "from the llm"
+    assert (db.read_bytes(), db.stat().st_mtime_ns) == before
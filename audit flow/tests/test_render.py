@@ -0,0 +1,37 @@
+import os, shutil, time
+import pytest
+from site_audit import render
+from site_audit.lhr_store import save_lhr
+
+pytestmark = pytest.mark.skipif(not shutil.which("node"), reason="node not installed")
+
+# stands in for lighthouse/report/generator/report-generator.js
+FAKE_GENERATOR = """
+export class ReportGenerator {
+  static generateReportHtml(lhr) { return '<html>' + lhr.finalUrl + '</html>'; }
+}
+"""
+
+
+def test_render_once_then_cached(tmp_path, monkeypatch):
+    lh = tmp_path / "lighthouse"
+    (lh / "report" / "generator").mkdir(parents=True)
+    (lh / "report" / "generator" / "report-generator.js").write_text(FAKE_GENERATOR)
+    (lh / "package.json").write_text('{"type": "module"}')
+    monkeypatch.setenv("LIGHTHOUSE_ROOT", str(lh))
+
+    raw = tmp_path / "raw_json"
+    raw.mkdir()
+    a = save_lhr({"finalUrl": "https://x.com/a"}, raw / "a.report.json.gz", "gz")
+    b = save_lhr({"finalUrl": "https://x.com/b"}, raw / "b.report.json")
+
+    outs = render.render_reports([a, b])
+    assert [o.name for o in outs] == ["a.report.html", "b.report.html"]
+    assert outs[0].read_text() == "<html>https://x.com/a</html>"
+
+    # up-to-date HTML is reused; a newer report gets re-rendered
+    stamp = outs[1].stat().st_mtime
+    os.utime(outs[0], (time.time() - 60, time.time() - 60))
+    assert not render.is_fresh(a) and render.is_fresh(b)
+    render.render_reports([a, b])
+    assert render.is_fresh(a) and outs[1].stat().st_mtime == stamp
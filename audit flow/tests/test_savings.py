@@ -0,0 +1,41 @@
+from site_audit.parse import audit_savings, savings_from_lhr, rows_from_lhr
+from site_audit.savings import SavingsIndex
+
+
+def _audit(items, score=0.3, **overall):
+    return {"title": "T", "score": score, "details": dict(overall, items=items)}
+
+
+def test_audit_savings_overall_sum_and_top_k():
+    items = [{"url": f"u{i}", "wastedBytes": i * 100} for i in range(10)]
+    sv = audit_savings(_audit(items), top_k=3)
+    assert sv["ms"] is None and sv["bytes"] == sum(i * 100 for i in range(10))
+    assert [label for label, _, _ in sv["items"]] == ["u9", "u8", "u7"]
+
+    sv = audit_savings(_audit(items, overallSavingsMs=450, overallSavingsBytes=123), top_k=3)
+    assert (sv["ms"], sv["bytes"]) == (450, 123)
+
+    lhr = {"finalUrl": "https://x.com/", "audits": {
+        "waste": _audit(items, overallSavingsMs=450),
+        "passed": _audit(items, score=1, overallSavingsMs=999),
+        "no-savings": _audit([{"node": {"snippet": "<img>"}}]),
+    }}
+    assert set(savings_from_lhr(lhr)) == {"waste"}
+    row = [r for r in rows_from_lhr(lhr) if r["Rule ID"] == "waste"][0]
+    assert (row["Savings (ms)"], row["Savings (bytes)"]) == (450, 4500)
+
+
+def test_index_ranks_rules_and_bounds_items():
+    ix = SavingsIndex(top_k=2)
+    for page, ms in (("https://x.com/a", 100), ("https://x.com/b", 300)):
+        ix.add(page, {
+            "slow": {"title": "Slow", "ms": ms, "bytes": 0,
+                     "items": [(f"{page}.js", ms, 0), (f"{page}.css", ms / 2, 0)]},
+            "big": {"title": "Big", "ms": 0, "bytes": 2048, "items": [("img", 0, 2048)]},
+        })
+    rows = ix.rows()
+    assert [r["Rule ID"] for r in rows] == ["slow", "big"]
+    assert rows[0]["Pages"] == 2 and rows[0]["Total Savings (ms)"] == 400
+    assert rows[0]["Top Items"].startswith("https://x.com/b.js (300 ms")
+    assert rows[0]["Top Items"].count(";") == 1  # top_k = 2
+    assert rows[1]["Total Savings (KiB)"] == 4.0
@@ -0,0 +1,24 @@
+from site_audit.simhash import simhash, distance, near_duplicates, SimHashIndex
+
+BASE = ("welcome to the shop " * 3 + " ".join(f"item{i}" for i in range(200))).split()
+
+
+def test_near_duplicates_alias_to_first_page():
+    a = simhash(BASE)
+    b = simhash(BASE + ["utm_source"])            # tracking variant
+    c = simhash([f"other{i}" for i in range(200)])  # different page
+    assert distance(a, b) <= 6
+    assert distance(a, c) > 10
+
+    alias = near_duplicates(["/a", "/b", "/c", "/nofp"],
+                            {"/a": a, "/b": b, "/c": c}, max_dist=6)
+    assert alias == {"/b": "/a"}
+
+
+def test_index_finds_any_fingerprint_within_k_bits():
+    idx = SimHashIndex(max_dist=4)
+    fp = 0x0123456789ABCDEF
+    idx.add("x", fp)
+    assert idx.find(fp ^ 0b1011) == "x"           # 3 bits off
+    assert idx.find(fp ^ (1 << 63 | 1 << 40 | 1 << 20 | 1)) == "x"
+    assert idx.find(fp ^ 0b111111) is None        # 6 bits off
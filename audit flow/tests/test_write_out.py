@@ -0,0 +1,56 @@
+import json
+from pathlib import Path
+import pandas as pd
+from site_audit.model import PageRecord
+from site_audit.parse import rows_from_lhr
+from site_audit.severity import SeverityMapper
+from site_audit.template_enrich import enrich_rows_template
+from site_audit import write_out
+from site_audit.write_out import page_frames, write_csvs, write_xlsx
+
+ROOT = Path(__file__).resolve().parents[1]
+LHR = ROOT / "tests" / "data" / "sample_lhr.json"
+RULES = ROOT / "config" / "rules.yaml"
+
+
+def _rows():
+    lhr = json.loads(LHR.read_text(encoding="utf-8"))
+    rows = rows_from_lhr(lhr)
+    mapper = SeverityMapper.from_yaml(str(RULES))
+    for r in rows:
+        r["Severity"] = mapper.grade(r, lhr["audits"])
+    return enrich_rows_template(rows)
+
+
+def test_page_records_write_same_csvs(tmp_path):
+    rows = _rows()
+    url = rows[0]["Page URL"]
+    alias = "https://example.com/other"
+    old = {url: rows, alias: [dict(r, **{"Page URL": alias, "Audited As": url}) for r in rows]}
+    page = PageRecord.from_rows(_rows())
+    new = {url: page, alias: page.alias(alias)}
+
+    assert page.rows() == rows and new[alias].rows() == old[alias]
+    assert new[alias].findings is page.findings
+
+    write_csvs(old, tmp_path / "old")
+    write_csvs(new, tmp_path / "new")
+    for f in sorted((tmp_path / "old" / "pages").iterdir()):
+        assert f.read_bytes() == (tmp_path / "new" / "pages" / f.name).read_bytes()
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "old" / "summary.csv"),
+                                  pd.read_csv(tmp_path / "new" / "summary.csv"))
+
+
+def test_frames_built_once_for_csv_and_xlsx(tmp_path, monkeypatch):
+    page = PageRecord.from_rows(_rows())
+    pages = {page.url: page, "https://example.com/other": page.alias("https://example.com/other")}
+    calls = []
+    real = write_out._page_frame
+    monkeypatch.setattr(write_out, "_page_frame", lambda u, p: calls.append(u) or real(u, p))
+
+    frames = page_frames(pages)
+    write_csvs(pages, tmp_path, frames)
+    write_xlsx(pages, tmp_path / "workbook.xlsx", frames=frames)
+    assert calls == list(pages)
+    summary = pd.read_excel(tmp_path / "workbook.xlsx", sheet_name="summary")
+    pd.testing.assert_frame_equal(summary, pd.read_csv(tmp_path / "summary.csv"), check_dtype=False)